@@ -43,13 +43,22 @@ Main Features:
         'account',
     ],
     'external_dependencies': {
-        'python': ['xlrd', 'openpyxl'],
+        'python': ['xlrd', 'openpyxl', 'xlsxwriter'],
     },
     'data': [
         'security/ir.model.access.csv',
+        'data/ir_cron_data.xml',
         'views/account_move_view.xml',
+        'views/import_invoice_job_view.xml',
+        'views/import_invoice_log_view.xml',
         'wizard/import_excel_wizard.xml',
     ],
+    'assets': {
+        'web.assets_backend': [
+            'is_odoo_invoice_import/static/src/js/chunked_upload_field.js',
+            'is_odoo_invoice_import/static/src/xml/chunked_upload_field.xml',
+        ],
+    },
     'images': [
         'static/description/banner.png',
     ],
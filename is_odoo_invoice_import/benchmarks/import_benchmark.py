@@ -0,0 +1,302 @@
+# -*- coding: utf-8 -*-
+##############################################################################
+#
+#   Módulo: odoo_import_invoice
+#   Archivo: benchmarks/import_benchmark.py
+#   Descripción:
+#       Banco de pruebas de rendimiento del importador de facturas.
+#       Genera libros Excel sintéticos con los EXPECTED_HEADERS (tamaño y
+#       forma configurables), ejecuta ImportInvoiceWizard.import_file contra
+#       una base de datos de pruebas local y reporta filas/s, facturas/s,
+#       memoria máxima (RSS) y consultas SQL. Cada resultado se agrega a un
+#       archivo JSON Lines para comparar entre versiones del módulo.
+#
+#   USO:
+#       Desde el shell de Odoo (recomendado):
+#           $ odoo-bin shell -c odoo.conf -d bench_db
+#           >>> from odoo.addons.is_odoo_invoice_import.benchmarks import import_benchmark
+#           >>> import_benchmark.run_benchmark(env, rows=50000, lines_per_invoice=5)
+#
+#       Como script:
+#           $ python3 import_benchmark.py -c odoo.conf -d bench_db --rows 50000 \
+#                 --lines-per-invoice 5 --partners 500 --stage validate
+#
+#       Por defecto la transacción se revierte al final (la base no cambia);
+#       use keep=True / --keep para conservar las facturas creadas. Cada
+#       corrida numera sus facturas con un identificador propio (run_id), de
+#       modo que repetir un escenario con keep=True no choca con las huellas
+#       de importación de la corrida anterior.
+#
+#   ⚠️ No ejecutar contra una base de datos de producción.
+#
+#   Autor: Allan E. Ramírez Madrid / INTEGRALL (2025)
+#   Licencia: AGPL-3.0 or later (https://www.gnu.org/licenses/agpl)
+#
+##############################################################################
+
+import argparse
+import base64
+import json
+import random
+import resource
+import time
+import uuid
+from datetime import date, timedelta
+from io import BytesIO
+
+from openpyxl import Workbook
+
+DEFAULT_OUTPUT = 'invoice_import_bench.jsonl'
+FIXTURE_PREFIX = 'BENCH'
+
+
+def _peak_rss_mb():
+    """Memoria residente máxima del proceso (ru_maxrss está en KB en Linux)."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+# ------------------------------------------------------------
+# DATOS DE PRUEBA
+# ------------------------------------------------------------
+def prepare_fixtures(env, company, partners, products, taxes_per_line):
+    """Crea (o reutiliza) partners y productos BENCH y elige diario, cuenta,
+    moneda e impuestos existentes de la compañía."""
+    partner_obj = env['res.partner']
+    vats = ['%s%06d' % (FIXTURE_PREFIX, i) for i in range(partners)]
+    existing = set(partner_obj.search([('vat', 'in', vats)]).mapped('vat'))
+    partner_obj.create([{'name': 'Bench Partner %s' % vat, 'vat': vat}
+                        for vat in vats if vat not in existing])
+
+    product_obj = env['product.product']
+    codes = ['%s-%05d' % (FIXTURE_PREFIX, i) for i in range(products)]
+    existing = set(product_obj.search([('default_code', 'in', codes)]).mapped('default_code'))
+    product_obj.create([{'name': 'Bench Product %s' % code, 'default_code': code, 'type': 'service'}
+                        for code in codes if code not in existing])
+
+    journal = env['account.journal'].search([
+        ('type', '=', 'purchase'), ('company_id', '=', company.id)], limit=1)
+    account = env['account.account'].search([
+        ('account_type', '=', 'expense'), ('company_id', '=', company.id)], limit=1)
+    taxes = env['account.tax'].search([
+        ('type_tax_use', '=', 'purchase'), ('company_id', '=', company.id)], limit=max(taxes_per_line, 1))
+    if not journal or not account:
+        raise ValueError("The benchmark database needs a purchase journal and an expense account.")
+
+    return {
+        'partners': vats,
+        'products': codes,
+        'journal_code': journal.code,
+        'account_code': account.code,
+        'currency': company.currency_id.name,
+        'taxes': taxes.mapped('name')[:taxes_per_line],
+    }
+
+
+def build_workbook(fixtures, rows=1000, lines_per_invoice=5, sorted_rows=True, seed=42, run_id=''):
+    """Genera un .xlsx (bytes) con ``rows`` filas agrupadas en facturas de
+    ``lines_per_invoice`` líneas. Con ``sorted_rows=False`` las filas se
+    mezclan (facturas no contiguas). ``run_id`` se agrega a excel_invoice y a
+    la referencia: dos libros con distinto ``run_id`` no comparten facturas."""
+    from odoo.addons.is_odoo_invoice_import.wizard.invoice_import import EXPECTED_HEADERS
+
+    prefix = 'BENCH-%s-' % run_id if run_id else 'BENCH-'
+
+    rnd = random.Random(seed)
+    base_date = date(2025, 1, 1)
+    data = []
+    for i in range(rows):
+        invoice_no = i // max(lines_per_invoice, 1)
+        rnd_invoice = random.Random(invoice_no + seed)
+        inv_date = base_date + timedelta(days=rnd_invoice.randrange(365))
+        values = {
+            'excel_invoice': '%s%07d' % (prefix, invoice_no),
+            'partner_vat_or_name': rnd_invoice.choice(fixtures['partners']),
+            'invoice_date': inv_date.strftime('%d-%m-%Y'),
+            'invoice_date_due': (inv_date + timedelta(days=30)).strftime('%d-%m-%Y'),
+            'product_code': rnd.choice(fixtures['products']),
+            'description': 'Bench line %s' % i,
+            'quantity': rnd.randint(1, 10),
+            'unit_price': round(rnd.uniform(1, 1000), 2),
+            'discount': rnd.choice((0, 0, 0, 5, 10)),
+            'taxes': ','.join(fixtures['taxes']),
+            'analytic_distribution': '',
+            'comment': '',
+            'ref_invoice': '%sREF-%07d' % (prefix, invoice_no),
+            'tipo_gasto': 'compra',
+            'currency': fixtures['currency'],
+            'firma_fel': '',
+            'serie_fel': '',
+            'numero_fel': '',
+            'journal_code': fixtures['journal_code'],
+            'account_code': fixtures['account_code'],
+            'invoice_type': 'in_invoice',
+            'payment_ref': '',
+            'accounting_date': inv_date.strftime('%d-%m-%Y'),
+        }
+        data.append([values[h] for h in EXPECTED_HEADERS])
+    if not sorted_rows:
+        rnd.shuffle(data)
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet('Bench')
+    ws.append(EXPECTED_HEADERS)
+    for values in data:
+        ws.append(values)
+    file_data = BytesIO()
+    wb.save(file_data)
+    return file_data.getvalue()
+
+
+# ------------------------------------------------------------
+# EJECUCIÓN
+# ------------------------------------------------------------
+def run_benchmark(env, rows=1000, lines_per_invoice=5, partners=100, products=200,
+                  taxes_per_line=1, stage='draft', error_handling='abort', batch_size=500,
+                  sorted_rows=True, keep=False, output=DEFAULT_OUTPUT, label=None):
+    """Ejecuta un escenario y retorna (y guarda) el resultado como dict."""
+    from odoo.modules.module import get_manifest
+
+    company = env.company
+    shape = {
+        'rows': rows,
+        'lines_per_invoice': lines_per_invoice,
+        'partners': partners,
+        'products': products,
+        'taxes_per_line': taxes_per_line,
+        'stage': stage,
+        'error_handling': error_handling,
+        'batch_size': batch_size,
+        'sorted_rows': sorted_rows,
+    }
+
+    fixtures = prepare_fixtures(env, company, partners, products, taxes_per_line)
+    # Facturas distintas en cada corrida: con keep=True una segunda corrida
+    # sobre el mismo libro solo encontraría duplicados (invoices=0).
+    run_id = uuid.uuid4().hex[:8]
+    content = build_workbook(fixtures, rows, lines_per_invoice, sorted_rows, run_id=run_id)
+    wizard = env['import.invoice.wizard'].create({
+        'company_id': company.id,
+        'import_product_by': 'code',
+        'account_option': 'from_excel_account',
+        'invoice_stage_option': stage,
+        'error_handling': error_handling,
+        'batch_size': batch_size,
+        'files': base64.b64encode(content),
+        'datas_fname': 'bench_%s.xlsx' % rows,
+    })
+    env.flush_all()
+
+    rss_before = _peak_rss_mb()
+    queries_before = env.cr.sql_log_count
+    start = time.perf_counter()
+    wizard.import_file()
+    env.flush_all()
+    elapsed = time.perf_counter() - start
+    queries = env.cr.sql_log_count - queries_before
+    rss_peak = _peak_rss_mb()
+
+    log = env['import.invoice.log'].search([], limit=1)
+    result = {
+        'label': label,
+        'run_id': run_id,
+        'module_version': get_manifest('is_odoo_invoice_import').get('version'),
+        'date': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'shape': shape,
+        'file_size': len(content),
+        'invoices': log.invoice_count,
+        'elapsed': round(elapsed, 3),
+        'rows_per_second': round(rows / elapsed, 1) if elapsed else 0.0,
+        'invoices_per_second': round(log.invoice_count / elapsed, 1) if elapsed else 0.0,
+        'queries': queries,
+        'peak_rss_mb': round(rss_peak, 1),
+        'rss_growth_mb': round(rss_peak - rss_before, 1),
+        'phases': {phase: {'time': round(log['%s_time' % phase], 3),
+                           'queries': log['%s_queries' % phase]}
+                   for phase in ('parse', 'validate', 'resolve', 'create', 'post')},
+    }
+
+    if keep:
+        env.cr.commit()
+    else:
+        env.cr.rollback()
+
+    if output:
+        with open(output, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(result) + '\n')
+    print_result(result, load_results(output) if output else [])
+    return result
+
+
+def load_results(path):
+    """Resultados guardados previamente (JSON Lines)."""
+    try:
+        with open(path, encoding='utf-8') as f:
+            return [json.loads(line) for line in f if line.strip()]
+    except FileNotFoundError:
+        return []
+
+
+def print_result(result, history=()):
+    """Imprime el resultado y lo compara con corridas previas del mismo escenario."""
+    print("Invoice import benchmark — version %s" % result['module_version'])
+    print("  shape: %s" % ', '.join('%s=%s' % item for item in sorted(result['shape'].items())))
+    print("  %s rows, %s invoices in %.2fs → %.1f rows/s, %.1f invoices/s"
+          % (result['shape']['rows'], result['invoices'], result['elapsed'],
+             result['rows_per_second'], result['invoices_per_second']))
+    print("  queries: %s   peak RSS: %.1f MB (+%.1f MB)"
+          % (result['queries'], result['peak_rss_mb'], result['rss_growth_mb']))
+    for phase, stats in result['phases'].items():
+        print("    %-8s %8.3fs %8d queries" % (phase, stats['time'], stats['queries']))
+
+    previous = [r for r in history if r['shape'] == result['shape']][:-1]
+    if previous:
+        print("  previous runs of this shape:")
+        for r in previous[-5:]:
+            print("    %s  v%s  %.1f rows/s  %s queries  %.1f MB"
+                  % (r['date'], r['module_version'], r['rows_per_second'], r['queries'], r['peak_rss_mb']))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Invoice import benchmark")
+    parser.add_argument('-c', '--config', required=True, help="Odoo configuration file")
+    parser.add_argument('-d', '--database', required=True, help="Local test database")
+    parser.add_argument('--rows', type=int, default=1000)
+    parser.add_argument('--lines-per-invoice', type=int, default=5)
+    parser.add_argument('--partners', type=int, default=100)
+    parser.add_argument('--products', type=int, default=200)
+    parser.add_argument('--taxes-per-line', type=int, default=1)
+    parser.add_argument('--stage', choices=('draft', 'validate'), default='draft')
+    parser.add_argument('--error-handling', choices=('abort', 'skip'), default='abort')
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--unsorted', action='store_true', help="Shuffle rows (non-contiguous invoices)")
+    parser.add_argument('--keep', action='store_true', help="Commit instead of rolling back")
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help="JSON Lines results file")
+    parser.add_argument('--label', help="Free text stored with the result")
+    args = parser.parse_args()
+
+    import odoo
+    from odoo import api, SUPERUSER_ID
+
+    odoo.tools.config.parse_config(['-c', args.config, '-d', args.database])
+    registry = odoo.registry(args.database)
+    with registry.cursor() as cr:
+        env = api.Environment(cr, SUPERUSER_ID, {})
+        run_benchmark(
+            env,
+            rows=args.rows,
+            lines_per_invoice=args.lines_per_invoice,
+            partners=args.partners,
+            products=args.products,
+            taxes_per_line=args.taxes_per_line,
+            stage=args.stage,
+            error_handling=args.error_handling,
+            batch_size=args.batch_size,
+            sorted_rows=not args.unsorted,
+            keep=args.keep,
+            output=args.output,
+            label=args.label,
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -11,19 +11,88 @@
 #
 #   HOW IT WORKS:
 #       - The user clicks the "Download Example Template" link.
-#       - The route calls the wizard’s internal method `download_template()`
-#         (executed in a temporary context).
-#       - The generated Excel file is streamed back as an HTTP response,
-#         without reloading or duplicating the transient record.
+#       - The route asks the wizard model for the rendered template
+#         (`_get_template_content()`), which is cached in process memory
+#         per language and module version.
+#       - The Excel file is streamed back as an HTTP response, without
+#         creating a transient record or an attachment.
+#
+#   CHUNKED UPLOAD (large files):
+#       - POST /odoo_import_invoice/upload (multipart): `chunk` (file part),
+#         `offset` (bytes already sent) and `upload_id` (omitted on the first
+#         chunk). Each chunk is spooled to a temporary file on disk.
+#         Returns {"upload_id": ..., "size": ...}; a negative or non-numeric
+#         `offset`, or one past the current size, returns 400.
+#       - The wizard form does this from the browser: the "Large File"
+#         field (widget `import_chunked_upload`) sends the file in chunks
+#         and stores the resulting `upload_id` as the wizard's upload_token.
+#       - POST /odoo_import_invoice/upload/finish: `upload_id`, `file_name`
+#         and optional wizard options. Creates the import wizard bound to the
+#         spooled file and returns {"wizard_id": ...}; `import_file` then
+#         streams the file from disk (no base64 copy in worker memory) and
+#         removes it once the import is committed.
+#
+#   JSON LINES INGESTION (machine-to-machine):
+#       - POST /odoo_import_invoice/ndjson with one JSON object per line,
+#         using the EXPECTED_HEADERS keys (an invoice may span several lines).
+#         Wizard options, `file_name` and, on multi-database servers, `db`
+#         go in the query string.
+#       - Authenticated with an Odoo API key (Preferences → Account Security
+#         → New API Key): `Authorization: Bearer <key>`. The import runs as
+#         the key's user. A missing or invalid key returns 401 before the
+#         body is read.
+#       - The body is spooled to disk and imported with the same pipeline as
+#         `import_file`, each invoice isolated as in the 'skip' mode.
+#       - When the lines of each invoice are contiguous, invoices are built
+#         and created batch by batch while the body is read, so the first
+#         results are sent before the rest of the file is processed.
+#       - The response is streamed as JSON lines, one per invoice:
+#         {"excel_invoice", "status": created|duplicate|error, "move_id",
+#         "name", "state", "error"}. Each batch is committed before its
+#         results are sent; a fatal error ends the stream with
+#         {"status": "failed", "error": ...}.
+#
+#   CSRF:
+#       - The browser routes (upload, upload/finish) use the session and
+#         keep Odoo's CSRF check: send `csrf_token` as a form field.
+#       - The ndjson route has no session (API key only), so CSRF does not
+#         apply to it and is disabled.
+#
+#   EXPORT (reverse of the template download):
+#       - The "Export to Import Template" action of the invoice list creates
+#         a wizard holding the selected moves and opens
+#         /odoo_import_invoice/export?wizard_id=...
+#       - The workbook is written to a temporary file (xlsxwriter,
+#         constant_memory) and streamed back in blocks, then removed.
 #
 #   Updated by: Allan E. Ramírez Madrid / INTEGRALL (2025)
 #   License: AGPL-3.0 or later (https://www.gnu.org/licenses/agpl)
 #
 ##############################################################################
 
-from odoo import http
+import json
+import logging
+import os
+import tempfile
+
+from odoo import api, http
 from odoo.http import request
-import base64
+from odoo.modules.registry import Registry
+
+from ..utils import upload_spool
+from ..wizard.invoice_import import EXPORT_FILENAME, TEMPLATE_FILENAME, TEMPLATE_MIMETYPE
+
+_logger = logging.getLogger(__name__)
+
+# Block size used to stream exported files back to the browser
+STREAM_BLOCK_SIZE = 1024 * 1024
+
+# Wizard options accepted by the upload "finish" and ndjson routes
+WIZARD_OPTIONS = (
+    'import_product_by', 'account_option', 'invoice_stage_option',
+    'error_handling', 'batch_size',
+)
+
 
 class ImportInvoiceController(http.Controller):
     """Public controller for the Excel template download of the import wizard."""
@@ -31,28 +100,19 @@ class ImportInvoiceController(http.Controller):
     @http.route('/odoo_import_invoice/download_template', type='http', auth='user')
     def download_invoice_template(self, **kwargs):
         """
-        Generates and returns the Excel example template without affecting
-        the wizard record (avoids disabling the Binary field 'files').
+        Returns the Excel example template without affecting the wizard
+        record (avoids disabling the Binary field 'files').
         """
         try:
-            # Create a transient wizard record just to call the generator
-            wizard = request.env['import.invoice.wizard'].sudo().create({})
-            result = wizard.download_template()
-
-            # Extract the attachment ID from the URL returned by the wizard method
-            attach_id = int(result['url'].split('/')[-1].split('?')[0])
-            attachment = request.env['ir.attachment'].sudo().browse(attach_id)
-
-            # Decode the binary data
-            file_content = base64.b64decode(attachment.datas or b'')
-            file_name = attachment.name or 'invoice_import_template.xlsx'
+            file_content = request.env['import.invoice.wizard']._get_template_content()
 
             # Build the HTTP response for direct download
             return request.make_response(
                 file_content,
                 headers=[
-                    ('Content-Type', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
-                    ('Content-Disposition', f'attachment; filename="{file_name}"'),
+                    ('Content-Type', TEMPLATE_MIMETYPE),
+                    ('Content-Length', str(len(file_content))),
+                    ('Content-Disposition', f'attachment; filename="{TEMPLATE_FILENAME}"'),
                 ]
             )
 
@@ -63,3 +123,121 @@ class ImportInvoiceController(http.Controller):
                 headers=[('Content-Type', 'text/plain; charset=utf-8')],
                 status=500
             )
+
+    @http.route('/odoo_import_invoice/upload', type='http', auth='user', methods=['POST'])
+    def upload_chunk(self, chunk=None, offset=0, upload_id=None, **kwargs):
+        """Receives one chunk of a large import file and appends it to the
+        spooled file at `offset`."""
+        if chunk is None:
+            return request.make_json_response({'error': 'Missing chunk'}, status=400)
+        upload_id = upload_id or upload_spool.new_token()
+        try:
+            # write_chunk rejects negative offsets and offsets past the end
+            size = upload_spool.write_chunk(
+                request.env.cr.dbname, request.env.uid, upload_id, int(offset), chunk.stream)
+        except ValueError as e:
+            return request.make_json_response({'error': str(e)}, status=400)
+        return request.make_json_response({'upload_id': upload_id, 'size': size})
+
+    @http.route('/odoo_import_invoice/upload/finish', type='http', auth='user', methods=['POST'])
+    def upload_finish(self, upload_id=None, file_name=None, **kwargs):
+        """Creates the import wizard bound to a completely uploaded file."""
+        try:
+            path = upload_spool.spool_path(request.env.cr.dbname, request.env.uid, upload_id)
+        except ValueError as e:
+            return request.make_json_response({'error': str(e)}, status=400)
+        if not os.path.exists(path):
+            return request.make_json_response({'error': 'Unknown upload'}, status=404)
+        vals = self._get_wizard_options(kwargs)
+        vals.update(upload_token=upload_id, datas_fname=file_name)
+        wizard = request.env['import.invoice.wizard'].create(vals)
+        return request.make_json_response({
+            'wizard_id': wizard.id,
+            'size': os.path.getsize(path),
+        })
+
+    @http.route('/odoo_import_invoice/ndjson', type='http', auth='none', methods=['POST'], csrf=False)
+    def import_ndjson(self, file_name=None, **kwargs):
+        """Imports invoices from a JSON Lines body and streams back one JSON
+        line per invoice."""
+        if not request.db:
+            return request.make_json_response({'error': 'No database selected'}, status=400)
+        uid = self._authenticate_api_key()
+        if not uid:
+            return request.make_json_response(
+                {'error': 'Invalid or missing API key'}, status=401,
+                headers=[('WWW-Authenticate', 'Bearer')])
+        request.update_env(user=uid)
+        request.update_context(**request.env['res.users'].context_get())
+        dbname = request.env.cr.dbname
+        upload_id = upload_spool.new_token()
+        upload_spool.write_chunk(dbname, uid, upload_id, 0, request.httprequest.stream)
+        vals = self._get_wizard_options(kwargs)
+        vals['datas_fname'] = file_name or 'invoices.jsonl'
+        return request.make_response(
+            self._stream_ndjson_results(dbname, uid, dict(request.env.context), upload_id, vals),
+            headers=[('Content-Type', 'application/x-ndjson; charset=utf-8')],
+        )
+
+    def _authenticate_api_key(self):
+        """User id of the `Authorization: Bearer <API key>` header, or None."""
+        scheme, _sep, key = request.httprequest.headers.get('Authorization', '').partition(' ')
+        if scheme.lower() != 'bearer' or not key.strip():
+            return None
+        return request.env['res.users.apikeys']._check_credentials(scope='rpc', key=key.strip())
+
+    def _get_wizard_options(self, kwargs):
+        vals = {key: kwargs[key] for key in WIZARD_OPTIONS if kwargs.get(key)}
+        if 'batch_size' in vals:
+            vals['batch_size'] = int(vals['batch_size'])
+        return vals
+
+    def _stream_ndjson_results(self, dbname, uid, context, upload_id, vals):
+        """Runs the import in its own cursor while the response is being sent
+        (the request cursor is already closed at that point)."""
+        path = upload_spool.spool_path(dbname, uid, upload_id)
+        try:
+            with Registry(dbname).cursor() as cr:
+                env = api.Environment(cr, uid, context)
+                wizard = env['import.invoice.wizard'].create(vals)
+                try:
+                    for results in wizard._iter_ndjson_import(path):
+                        cr.commit()
+                        for result in results:
+                            yield json.dumps(result) + '\n'
+                except Exception as e:
+                    cr.rollback()
+                    _logger.exception("JSON lines invoice import failed")
+                    yield json.dumps({'status': 'failed', 'error': wizard._get_error_message(e)}) + '\n'
+        finally:
+            upload_spool.remove(dbname, uid, upload_id)
+
+    @http.route('/odoo_import_invoice/export', type='http', auth='user')
+    def export_invoices(self, wizard_id=None, **kwargs):
+        """Streams the selected invoices in the import template layout."""
+        wizard = request.env['import.invoice.wizard'].browse(int(wizard_id or 0)).exists()
+        if not wizard or wizard.create_uid != request.env.user:
+            return request.not_found()
+        fd, path = tempfile.mkstemp(suffix='.xlsx')
+        os.close(fd)
+        try:
+            wizard._export_moves(path)
+        except Exception:
+            os.remove(path)
+            raise
+        return request.make_response(
+            self._iter_file(path),
+            headers=[
+                ('Content-Type', TEMPLATE_MIMETYPE),
+                ('Content-Length', str(os.path.getsize(path))),
+                ('Content-Disposition', f'attachment; filename="{EXPORT_FILENAME}"'),
+            ]
+        )
+
+    def _iter_file(self, path):
+        """Yields the file in blocks and removes it once sent."""
+        try:
+            with open(path, 'rb') as f:
+                yield from iter(lambda: f.read(STREAM_BLOCK_SIZE), b'')
+        finally:
+            os.remove(path)
@@ -1,5 +1,9 @@
 # -*- coding:utf-8 -*-
 
 from . import account_move
+from . import import_invoice_job
+from . import import_invoice_log
+from . import product
+from . import res_partner
 
 # vim:expandtab:smartindent:tabstop=4:softtabstop=4:shiftwidth=4:
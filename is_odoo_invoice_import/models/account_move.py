@@ -1,8 +1,27 @@
 # # -*- coding: utf-8 -*-
 
-from odoo import api, fields, models
+from odoo import fields, models
 
 class AccountMove(models.Model):
     _inherit = "account.move"
 
-    url = fields.Char(string="URL")
\ No newline at end of file
+    url = fields.Char(string="URL")
+
+    # Huella de importación desde Excel (hash del archivo, excel_invoice,
+    # partner y ref): permite reimportar un archivo sin duplicar facturas.
+    import_fingerprint = fields.Char(
+        string="Import Fingerprint",
+        index=True,
+        copy=False,
+        readonly=True,
+    )
+
+    def action_export_import_template(self):
+        """Exporta las facturas seleccionadas al formato de la plantilla de
+        importación (descarga servida por el controlador)."""
+        wizard = self.env['import.invoice.wizard'].create({'export_move_ids': [(6, 0, self.ids)]})
+        return {
+            'type': 'ir.actions.act_url',
+            'url': '/odoo_import_invoice/export?wizard_id=%s' % wizard.id,
+            'target': 'self',
+        }
@@ -0,0 +1,399 @@
+# -*- coding: utf-8 -*-
+##############################################################################
+#
+#   Módulo: odoo_import_invoice
+#   Archivo: models/import_invoice_job.py
+#   Descripción:
+#       Trabajos de importación de facturas en segundo plano.
+#       El archivo se guarda como adjunto y un cron lo procesa por lotes
+#       de facturas (excel_invoice), confirmando (commit) después de cada
+#       lote. Un trabajo fallido o interrumpido se reanuda desde el último
+#       lote confirmado.
+#
+#   DIRECTORIO VIGILADO:
+#       Un segundo cron toma los archivos .xls / .xlsx copiados al directorio
+#       configurado en el parámetro del sistema
+#       `is_odoo_invoice_import.watch_directory`, crea un trabajo por archivo
+#       (una sola vez por contenido, según su hash SHA-256) y al terminar lo
+#       mueve a las subcarpetas done/ o failed/. Las opciones del trabajo se
+#       toman de los parámetros `is_odoo_invoice_import.watch_<opción>`
+#       (p. ej. watch_invoice_stage_option = validate).
+#
+#   Autor: Allan E. Ramírez Madrid / INTEGRALL (2025)
+#   Licencia: AGPL-3.0 or later (https://www.gnu.org/licenses/agpl)
+#
+##############################################################################
+
+import itertools
+import logging
+import os
+import shutil
+import time
+from datetime import timedelta
+
+from odoo import models, fields, api, _
+from odoo.exceptions import UserError
+from odoo.tools import config
+
+from ..utils import excel_reader, upload_spool
+
+_logger = logging.getLogger(__name__)
+
+# Tiempo máximo (segundos) que una ejecución del cron dedica a un trabajo;
+# el resto se procesa en la siguiente ejecución.
+JOB_TIME_BUDGET = 600
+
+# Fracción del límite de tiempo real del worker (limit_time_real_cron /
+# limit_time_real) que se usa como presupuesto: el resto queda de margen
+# para la lectura del archivo y el último lote antes de que el worker muera.
+JOB_TIME_BUDGET_RATIO = 0.5
+
+WATCH_PARAM_PREFIX = 'is_odoo_invoice_import.watch_'
+
+# Opciones del trabajo configurables para el directorio vigilado (enteras o texto)
+WATCH_OPTIONS = {
+    'company_id': int,
+    'import_product_by': str,
+    'account_option': str,
+    'invoice_stage_option': str,
+    'batch_size': int,
+}
+
+WATCH_EXTENSIONS = ('.xls', '.xlsx')
+
+# Un archivo modificado hace menos de estos segundos aún se está copiando
+WATCH_SETTLE_SECONDS = 60
+
+
+def _get_job_time_budget():
+    """Presupuesto de una ejecución del cron, por debajo del límite de tiempo
+    real del worker (sin límite configurado: JOB_TIME_BUDGET)."""
+    limit = config.get('limit_time_real_cron', -1)
+    if limit is None or limit < 0:
+        limit = config.get('limit_time_real') or 0
+    if limit <= 0:
+        return JOB_TIME_BUDGET
+    return min(JOB_TIME_BUDGET, limit * JOB_TIME_BUDGET_RATIO)
+
+
+def _move_file(path, directory):
+    """Mueve ``path`` a ``directory`` sin sobrescribir; retorna la nueva ruta."""
+    os.makedirs(directory, exist_ok=True)
+    target = os.path.join(directory, os.path.basename(path))
+    if os.path.exists(target):
+        base, ext = os.path.splitext(target)
+        target = '%s_%s%s' % (base, time.strftime('%Y%m%d%H%M%S'), ext)
+    shutil.move(path, target)
+    return target
+
+
+class ImportInvoiceJob(models.Model):
+    _name = 'import.invoice.job'
+    _description = 'Invoice Import Job'
+    _order = 'id desc'
+
+    name = fields.Char(required=True)
+    state = fields.Selection([
+        ('draft', 'Draft'),
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed')],
+        string='Status',
+        default='draft',
+        required=True,
+        readonly=True,
+        copy=False,
+    )
+
+    # Archivo y opciones (copiadas del asistente)
+    attachment_id = fields.Many2one('ir.attachment', string='File', readonly=True, copy=False)
+    file_name = fields.Char(string='File Name', readonly=True)
+    source_path = fields.Char(string='Source File', readonly=True, copy=False,
+                              help="File taken from the watched directory or uploaded in chunks.")
+    file_hash = fields.Char(string='File Hash', index=True, readonly=True, copy=False)
+    company_id = fields.Many2one('res.company', required=True, string='Company',
+                                 default=lambda self: self.env.company)
+    import_product_by = fields.Selection([
+        ('name', 'Name'),
+        ('code', 'Code'),
+        ('barcode', 'Barcode')],
+        string='Import Product By',
+        default='name'
+    )
+    account_option = fields.Selection([
+        ('product_incexp_account', 'Use Account from Configuration Product/Property'),
+        ('from_excel_account', 'Use Account from Excel')],
+        string='Account Option',
+        default='from_excel_account'
+    )
+    invoice_stage_option = fields.Selection([
+        ('draft', 'Import Draft Invoice'),
+        ('validate', 'Validate Invoice Automatically with Import')],
+        string='Invoice Stage Option',
+        default='draft'
+    )
+    batch_size = fields.Integer(string='Batch Size', default=500)
+
+    # Progreso (se confirma junto con cada lote)
+    total_rows = fields.Integer(string='Total Rows', readonly=True, copy=False)
+    rows_done = fields.Integer(string='Rows Done', readonly=True, copy=False)
+    total_invoices = fields.Integer(string='Total Invoices', readonly=True, copy=False)
+    invoices_done = fields.Integer(string='Invoices Created', readonly=True, copy=False)
+    row_offset = fields.Integer(
+        string='Resume After Row', readonly=True, copy=False,
+        help="Last file row already imported (files grouped by excel_invoice): "
+             "the next run reads from the following row.")
+    progress = fields.Float(string='Progress (%)', compute='_compute_progress')
+    date_started = fields.Datetime(string='Started On', readonly=True, copy=False)
+    date_finished = fields.Datetime(string='Finished On', readonly=True, copy=False)
+    date_eta = fields.Datetime(string='Estimated Completion', readonly=True, copy=False)
+    error_message = fields.Text(string='Error', readonly=True, copy=False)
+    move_ids = fields.Many2many('account.move', string='Created Invoices', readonly=True, copy=False)
+
+    @api.depends('rows_done', 'total_rows')
+    def _compute_progress(self):
+        for job in self:
+            job.progress = 100.0 * job.rows_done / job.total_rows if job.total_rows else 0.0
+
+    # ------------------------------------------------------------
+    # ACCIONES
+    # ------------------------------------------------------------
+    def _attach_file(self, raw):
+        """Guarda el archivo (bytes) como adjunto del trabajo."""
+        for job in self:
+            job.attachment_id = self.env['ir.attachment'].create({
+                'name': job.file_name or 'invoice_import.xlsx',
+                'type': 'binary',
+                'raw': raw,
+                'res_model': self._name,
+                'res_id': job.id,
+            })
+
+    def action_queue(self):
+        """Encola (o reanuda) el trabajo y dispara el cron."""
+        if self.filtered(lambda job: not job.attachment_id and not job.source_path):
+            raise UserError(_("The import job has no file attached."))
+        self.write({'state': 'queued', 'error_message': False})
+        self.env.ref('is_odoo_invoice_import.ir_cron_import_invoice_job')._trigger()
+
+    def action_resume(self):
+        """Reanuda un trabajo fallido desde el último lote confirmado."""
+        return self.filtered(lambda job: job.state == 'failed').action_queue()
+
+    def action_open_moves(self):
+        self.ensure_one()
+        action = self.env["ir.actions.actions"]._for_xml_id("account.action_move_in_invoice_type")
+        action['domain'] = [('id', 'in', self.move_ids.ids)]
+        return action
+
+    def _get_form_action(self):
+        self.ensure_one()
+        return {
+            'type': 'ir.actions.act_window',
+            'res_model': self._name,
+            'res_id': self.id,
+            'view_mode': 'form',
+            'target': 'current',
+        }
+
+    # ------------------------------------------------------------
+    # PROCESAMIENTO (CRON)
+    # ------------------------------------------------------------
+    @api.model
+    def _cron_process_jobs(self):
+        """Procesa los trabajos pendientes. Los trabajos en 'running' cuyo
+        proceso se interrumpió (timeout, reinicio) se reanudan también."""
+        deadline = time.monotonic() + _get_job_time_budget()
+        for job in self.search([('state', 'in', ('queued', 'running'))], order='id'):
+            if time.monotonic() >= deadline:
+                break
+            job._process(deadline)
+
+    def _get_import_wizard(self):
+        """Asistente con las opciones del trabajo, ejecutado como su autor."""
+        self.ensure_one()
+        env = self.with_user(self.create_uid).with_company(self.company_id).env
+        return env['import.invoice.wizard'].create({
+            'company_id': self.company_id.id,
+            'import_product_by': self.import_product_by,
+            'account_option': self.account_option,
+            'invoice_stage_option': self.invoice_stage_option,
+            'batch_size': self.batch_size,
+        })
+
+    def _get_file_source(self):
+        """Ruta del archivo del directorio vigilado o del adjunto en el
+        filestore (lectura en streaming desde disco) o, si el adjunto está en
+        la base de datos, su contenido."""
+        if self.source_path:
+            return self.source_path
+        attachment = self.attachment_id.sudo()
+        if attachment.store_fname:
+            return attachment._full_path(attachment.store_fname)
+        return attachment.raw
+
+    def _process(self, deadline):
+        """Procesa el trabajo por lotes, con commit después de cada lote.
+
+        Archivo agrupado por excel_invoice: las facturas se construyen en
+        streaming desde ``row_offset`` (la última fila ya importada), sin
+        volver a convertir las filas anteriores. Archivo no agrupado: las
+        ``invoices_done`` primeras facturas (orden de aparición) se omiten
+        antes de construir sus valores.
+        """
+        self.ensure_one()
+        cr = self.env.cr
+        try:
+            wizard = self._get_import_wizard()
+            content = self._get_file_source()
+            wizard = wizard._with_file_hash(content)
+
+            # Primera pasada: referencias, agrupación y totales de lo pendiente
+            grouping = {}
+            keys = {}
+            data_rows = wizard._track_grouping(
+                wizard._iter_data_rows(content, start_row=self.row_offset), grouping)
+            lookups = wizard._prepare_lookups(self._count_rows(data_rows, keys))
+
+            if self.state == 'queued' or not self.date_started:
+                self.date_started = fields.Datetime.now()
+            values = {'state': 'running'}
+            if not self.total_invoices:
+                values.update(total_invoices=len(keys), total_rows=sum(keys.values()))
+            self.write(values)
+            cr.commit()
+
+            if grouping['contiguous']:
+                invoices = wizard._iter_grouped_invoice_rows(
+                    wizard._iter_data_rows(content, start_row=self.row_offset), lookups)
+            else:
+                done_keys = set(itertools.islice(keys, self.invoices_done))
+                data_rows = ((row, data) for row, data in wizard._iter_data_rows(content)
+                             if data['excel_invoice'] not in done_keys)
+                invoices = ((0, vals) for vals in wizard._build_invoice_vals(data_rows, lookups).values())
+
+            batch_size = max(self.batch_size or 0, 1)
+            run_start, run_done = time.monotonic(), 0
+            batch = []
+            for last_row, vals in invoices:
+                batch.append((last_row, vals))
+                if len(batch) < batch_size:
+                    continue
+                if time.monotonic() >= deadline:
+                    return
+                run_done += self._commit_batch(wizard, batch, run_start, run_done)
+                batch = []
+            if batch:
+                if time.monotonic() >= deadline:
+                    return
+                self._commit_batch(wizard, batch, run_start, run_done)
+
+            self.write({'state': 'done', 'date_finished': fields.Datetime.now(), 'date_eta': False})
+            self._move_source_file('done')
+            cr.commit()
+        except Exception as e:
+            cr.rollback()
+            _logger.exception("Invoice import job %s failed", self.id)
+            self.write({'state': 'failed', 'error_message': str(e)})
+            self._move_source_file('failed')
+            cr.commit()
+
+    def _count_rows(self, data_rows, keys):
+        """Deja pasar las filas y cuenta en ``keys`` {excel_invoice: filas},
+        en el orden de aparición de cada factura."""
+        for row, data in data_rows:
+            keys[data['excel_invoice']] = keys.get(data['excel_invoice'], 0) + 1
+            yield row, data
+
+    def _commit_batch(self, wizard, batch, run_start, run_done):
+        """Crea un lote de (última fila, valores), guarda el progreso (y el
+        punto de reanudación) y confirma. Retorna las facturas del lote."""
+        moves = wizard._flush_move_batch([vals for last_row, vals in batch])
+        run_done += len(batch)
+        remaining = max(self.total_invoices - self.invoices_done - len(batch), 0)
+        seconds_left = (time.monotonic() - run_start) / run_done * remaining
+        values = {
+            'invoices_done': self.invoices_done + len(batch),
+            'rows_done': self.rows_done + sum(len(vals['invoice_line_ids']) for last_row, vals in batch),
+            'move_ids': [(4, move_id) for move_id in moves.ids],
+            'date_eta': fields.Datetime.now() + timedelta(seconds=seconds_left),
+        }
+        if batch[-1][0]:
+            values['row_offset'] = batch[-1][0]
+        self.write(values)
+        self.env.cr.commit()
+        self.env.invalidate_all()
+        return len(batch)
+
+    # ------------------------------------------------------------
+    # DIRECTORIO VIGILADO (CRON)
+    # ------------------------------------------------------------
+    @api.model
+    def _cron_scan_watch_directory(self):
+        """Crea un trabajo por cada archivo nuevo del directorio vigilado.
+
+        Los archivos se mueven a processing/ para que no se vuelvan a tomar;
+        un archivo cuyo contenido ya fue importado (mismo hash) se mueve
+        directamente a done/ sin crear un trabajo.
+        """
+        directory = self._get_watch_directory()
+        if not directory:
+            return
+        options = self._get_watch_options()
+        settled = time.time() - WATCH_SETTLE_SECONDS
+        for entry in sorted(os.scandir(directory), key=lambda entry: entry.name):
+            if not entry.is_file() or not entry.name.lower().endswith(WATCH_EXTENSIONS):
+                continue
+            if entry.stat().st_mtime > settled:
+                continue
+            file_hash = excel_reader.source_digest(entry.path)
+            if self.search_count([('file_hash', '=', file_hash), ('state', '!=', 'failed')]):
+                _logger.info("Watched file %s was already imported, moved to done/", entry.name)
+                _move_file(entry.path, os.path.join(directory, 'done'))
+                continue
+            path = _move_file(entry.path, os.path.join(directory, 'processing'))
+            try:
+                job = self.create(dict(options, name=entry.name, file_name=entry.name,
+                                       source_path=path, file_hash=file_hash))
+                job.action_queue()
+                self.env.cr.commit()
+            except Exception:
+                # Sin trabajo: el archivo vuelve al directorio para el próximo escaneo
+                self.env.cr.rollback()
+                shutil.move(path, entry.path)
+                _logger.exception("Could not create an import job for watched file %s", entry.name)
+
+    @api.model
+    def _get_watch_directory(self):
+        directory = self.env['ir.config_parameter'].sudo().get_param(WATCH_PARAM_PREFIX + 'directory')
+        if not directory:
+            return False
+        if not os.path.isdir(directory):
+            _logger.warning("Invoice import watched directory %s does not exist", directory)
+            return False
+        return directory
+
+    @api.model
+    def _get_watch_options(self):
+        """Opciones de los trabajos del directorio vigilado (parámetros del sistema)."""
+        params = self.env['ir.config_parameter'].sudo()
+        options = {}
+        for name, convert in WATCH_OPTIONS.items():
+            value = params.get_param(WATCH_PARAM_PREFIX + name)
+            if value:
+                options[name] = convert(value)
+        return options
+
+    def _move_source_file(self, folder):
+        """Mueve el archivo del directorio vigilado a la subcarpeta ``folder``.
+        Una carga por partes se elimina al terminar (se conserva si falló,
+        para poder reanudar)."""
+        if not self.source_path or not os.path.isfile(self.source_path):
+            return
+        if upload_spool.is_claimed(self.env.cr.dbname, self.source_path):
+            if folder == 'done':
+                os.remove(self.source_path)
+            return
+        root = os.path.dirname(os.path.dirname(self.source_path))
+        self.source_path = _move_file(self.source_path, os.path.join(root, folder))
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+##############################################################################
+#
+#   Módulo: odoo_import_invoice
+#   Archivo: models/import_invoice_log.py
+#   Descripción:
+#       Historial de ejecuciones del importador de facturas, con tiempo y
+#       cantidad de consultas SQL por fase (lectura, validación, resolución,
+#       creación y publicación) y los lotes / filas más lentos.
+#       Permite detectar regresiones de rendimiento tras actualizaciones.
+#
+#   Autor: Allan E. Ramírez Madrid / INTEGRALL (2025)
+#   Licencia: AGPL-3.0 or later (https://www.gnu.org/licenses/agpl)
+#
+##############################################################################
+
+from odoo import models, fields, api
+
+from ..utils.import_profiler import PHASES
+
+
+class ImportInvoiceLog(models.Model):
+    _name = 'import.invoice.log'
+    _description = 'Invoice Import Log'
+    _order = 'id desc'
+
+    name = fields.Char(string='File Name', readonly=True)
+    company_id = fields.Many2one('res.company', string='Company', readonly=True)
+    state = fields.Selection([
+        ('done', 'Done'),
+        ('failed', 'Failed')],
+        string='Status',
+        readonly=True,
+    )
+    error_message = fields.Text(string='Error', readonly=True)
+    invoice_stage_option = fields.Char(string='Invoice Stage', readonly=True)
+    error_handling = fields.Char(string='Error Handling', readonly=True)
+    module_version = fields.Char(string='Module Version', readonly=True)
+
+    file_size = fields.Integer(string='File Size (bytes)', readonly=True)
+    row_count = fields.Integer(string='Rows', readonly=True)
+    invoice_count = fields.Integer(string='Invoices', readonly=True)
+    total_time = fields.Float(string='Total Time (s)', digits=(16, 3), readonly=True)
+    rows_per_second = fields.Float(string='Rows / s', digits=(16, 1),
+                                   compute='_compute_rows_per_second')
+
+    parse_time = fields.Float(string='Parse Time (s)', digits=(16, 3), readonly=True)
+    parse_queries = fields.Integer(string='Parse Queries', readonly=True)
+    validate_time = fields.Float(string='Validate Time (s)', digits=(16, 3), readonly=True)
+    validate_queries = fields.Integer(string='Validate Queries', readonly=True)
+    resolve_time = fields.Float(string='Resolve Time (s)', digits=(16, 3), readonly=True)
+    resolve_queries = fields.Integer(string='Resolve Queries', readonly=True)
+    create_time = fields.Float(string='Create Time (s)', digits=(16, 3), readonly=True)
+    create_queries = fields.Integer(string='Create Queries', readonly=True)
+    post_time = fields.Float(string='Post Time (s)', digits=(16, 3), readonly=True)
+    post_queries = fields.Integer(string='Post Queries', readonly=True)
+
+    slowest_items = fields.Text(string='Slowest Rows / Batches', readonly=True)
+
+    @api.depends('row_count', 'total_time')
+    def _compute_rows_per_second(self):
+        for log in self:
+            log.rows_per_second = log.row_count / log.total_time if log.total_time else 0.0
+
+    @api.model
+    def _prepare_log_vals(self, profiler):
+        """Valores de tiempo / consultas por fase desde un ``ImportProfiler``."""
+        vals = {
+            'row_count': profiler.row_count,
+            'total_time': profiler.total_time(),
+            'slowest_items': "\n".join(
+                "%.3fs  %s" % (elapsed, label) for elapsed, label in profiler.slowest()
+            ),
+        }
+        for phase in PHASES:
+            vals['%s_time' % phase] = profiler.times[phase]
+            vals['%s_queries' % phase] = profiler.queries[phase]
+        return vals
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+##############################################################################
+#
+#   Módulo: odoo_import_invoice
+#   Archivo: models/product.py
+#   Descripción:
+#       Invalida la caché de resolución de productos del importador
+#       (utils/lookup_cache.py) al crear, modificar o eliminar productos:
+#       solo las entradas de esas variantes y de sus códigos / nombres /
+#       códigos de barras. El nombre se guarda en la plantilla, por lo que
+#       product.template también invalida (las variantes de la plantilla).
+#
+#   Autor: Allan E. Ramírez Madrid / INTEGRALL (2025)
+#   Licencia: AGPL-3.0 or later (https://www.gnu.org/licenses/agpl)
+#
+##############################################################################
+
+from odoo import api, models
+
+from ..utils import lookup_cache
+
+# Campos que determinan qué producto corresponde a un código / nombre /
+# código de barras del Excel
+PRODUCT_LOOKUP_FIELDS = {'default_code', 'barcode', 'name', 'active', 'company_id', 'product_tmpl_id'}
+
+
+class ProductProduct(models.Model):
+    _inherit = 'product.product'
+
+    def init(self):
+        super().init()
+        lookup_cache.create_sequence(self.env.cr, 'product')
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        products = super().create(vals_list)
+        # Un producto nuevo puede coincidir antes que el guardado en caché
+        products._invalidate_import_lookups()
+        return products
+
+    def write(self, vals):
+        res = super().write(vals)
+        if PRODUCT_LOOKUP_FIELDS.intersection(vals):
+            self._invalidate_import_lookups()
+        return res
+
+    def unlink(self):
+        self._invalidate_import_lookups()
+        return super().unlink()
+
+    def _invalidate_import_lookups(self):
+        lookup_cache.invalidate_on_commit(
+            self.env, 'product', self,
+            self.mapped('default_code') + self.mapped('barcode') + self.mapped('name'))
+
+
+class ProductTemplate(models.Model):
+    _inherit = 'product.template'
+
+    def write(self, vals):
+        res = super().write(vals)
+        if PRODUCT_LOOKUP_FIELDS.intersection(vals):
+            self.with_context(active_test=False).product_variant_ids._invalidate_import_lookups()
+        return res
+
+    def unlink(self):
+        self.with_context(active_test=False).product_variant_ids._invalidate_import_lookups()
+        return super().unlink()
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+##############################################################################
+#
+#   Módulo: odoo_import_invoice
+#   Archivo: models/res_partner.py
+#   Descripción:
+#       Invalida la caché de resolución de partners del importador
+#       (utils/lookup_cache.py) al crear, modificar o eliminar partners:
+#       solo las entradas de esos partners y de sus NIT / nombres.
+#
+#   Autor: Allan E. Ramírez Madrid / INTEGRALL (2025)
+#   Licencia: AGPL-3.0 or later (https://www.gnu.org/licenses/agpl)
+#
+##############################################################################
+
+from odoo import api, models
+
+from ..utils import lookup_cache
+
+# Campos que determinan qué partner corresponde a un NIT / nombre del Excel
+PARTNER_LOOKUP_FIELDS = {'vat', 'name', 'active', 'company_id'}
+
+
+class ResPartner(models.Model):
+    _inherit = 'res.partner'
+
+    def init(self):
+        super().init()
+        lookup_cache.create_sequence(self.env.cr, 'partner')
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        partners = super().create(vals_list)
+        # Un partner nuevo puede coincidir antes que el guardado en caché
+        partners._invalidate_import_lookups()
+        return partners
+
+    def write(self, vals):
+        res = super().write(vals)
+        if PARTNER_LOOKUP_FIELDS.intersection(vals):
+            self._invalidate_import_lookups()
+        return res
+
+    def unlink(self):
+        self._invalidate_import_lookups()
+        return super().unlink()
+
+    def _invalidate_import_lookups(self):
+        lookup_cache.invalidate_on_commit(
+            self.env, 'partner', self, self.mapped('vat') + self.mapped('name'))
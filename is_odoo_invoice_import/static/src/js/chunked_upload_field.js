@@ -0,0 +1,79 @@
+/** @odoo-module **/
+/**
+ * Chunked upload of large import files.
+ *
+ * Widget for the wizard's `upload_token` field: the selected file is sent
+ * to /odoo_import_invoice/upload in CHUNK_SIZE slices (the whole file is
+ * never base64-encoded in the browser or in the server worker). When the
+ * last chunk is stored, the returned upload_id is written to
+ * `upload_token` and the file name to `datas_fname`; `import_file` then
+ * reads the spooled file from disk.
+ */
+
+import { registry } from "@web/core/registry";
+import { useService } from "@web/core/utils/hooks";
+import { _lt } from "@web/core/l10n/translation";
+import { standardFieldProps } from "@web/views/fields/standard_field_props";
+
+import { Component, useState } from "@odoo/owl";
+
+// Bytes sent per request
+const CHUNK_SIZE = 8 * 1024 * 1024;
+
+export class ChunkedUploadField extends Component {
+    setup() {
+        this.notification = useService("notification");
+        this.state = useState({ uploading: false, progress: 0 });
+    }
+
+    async onFileChange(ev) {
+        const file = ev.target.files[0];
+        if (!file) {
+            return;
+        }
+        this.state.uploading = true;
+        this.state.progress = 0;
+        try {
+            const uploadId = await this.uploadFile(file);
+            await this.props.record.update({ upload_token: uploadId, datas_fname: file.name });
+        } catch (error) {
+            this.notification.add(error.message, { type: "danger" });
+        } finally {
+            this.state.uploading = false;
+            ev.target.value = "";
+        }
+    }
+
+    async uploadFile(file) {
+        let uploadId = null;
+        let offset = 0;
+        do {
+            const formData = new FormData();
+            formData.append("csrf_token", odoo.csrf_token);
+            formData.append("offset", offset);
+            if (uploadId) {
+                formData.append("upload_id", uploadId);
+            }
+            formData.append("chunk", file.slice(offset, offset + CHUNK_SIZE), file.name);
+            const response = await fetch("/odoo_import_invoice/upload", {
+                method: "POST",
+                body: formData,
+            });
+            const result = await response.json();
+            if (!response.ok || result.error) {
+                throw new Error(result.error || response.statusText);
+            }
+            uploadId = result.upload_id;
+            offset = result.size;
+            this.state.progress = Math.round((100 * offset) / (file.size || 1));
+        } while (offset < file.size);
+        return uploadId;
+    }
+}
+
+ChunkedUploadField.template = "is_odoo_invoice_import.ChunkedUploadField";
+ChunkedUploadField.props = { ...standardFieldProps };
+ChunkedUploadField.displayName = _lt("Chunked Upload");
+ChunkedUploadField.supportedTypes = ["char"];
+
+registry.category("fields").add("import_chunked_upload", ChunkedUploadField);
@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+##############################################################################
+#
+#   Módulo: odoo_import_invoice
+#   Archivo: tests/test_invoice_import.py
+#   Descripción:
+#       Pruebas del asistente de importación: modo 'abort' (todo o nada),
+#       modo 'skip' (se omiten solo las facturas con errores), reimportación
+#       idempotente por huella, resultados de la importación NDJSON e
+#       invalidación de la caché de referencias.
+#
+#   Autor: Allan E. Ramírez Madrid / INTEGRALL (2025)
+#   Licencia: AGPL-3.0 or later (https://www.gnu.org/licenses/agpl)
+#
+##############################################################################
+
+import base64
+import json
+from io import BytesIO
+
+from openpyxl import Workbook
+
+from odoo.addons.account.tests.common import AccountTestInvoicingCommon
+from odoo.addons.is_odoo_invoice_import.utils import lookup_cache
+from odoo.addons.is_odoo_invoice_import.wizard.invoice_import import EXPECTED_HEADERS
+from odoo.exceptions import ValidationError
+from odoo.tests import tagged
+
+
+@tagged('post_install', '-at_install')
+class TestInvoiceImport(AccountTestInvoicingCommon):
+
+    @classmethod
+    def setUpClass(cls, chart_template_ref=None):
+        super().setUpClass(chart_template_ref=chart_template_ref)
+        cls.journal = cls.company_data['default_journal_sale']
+        cls.account = cls.company_data['default_account_revenue']
+
+    def setUp(self):
+        super().setUp()
+        # tipo_gasto y los campos FEL los agrega la localización (no es una
+        # dependencia del módulo): fuera de ella se omiten al crear.
+        wizard_class = type(self.env['import.invoice.wizard'])
+        prepare_invoice_vals = wizard_class._prepare_invoice_vals
+        move_fields = self.env['account.move']._fields
+
+        def _prepare_invoice_vals(wizard, *args):
+            vals = prepare_invoice_vals(wizard, *args)
+            return {name: value for name, value in vals.items() if name in move_fields}
+
+        self.patch(wizard_class, '_prepare_invoice_vals', _prepare_invoice_vals)
+
+    # ------------------------------------------------------------
+    # AUXILIARES
+    # ------------------------------------------------------------
+    def _row(self, excel_invoice, **values):
+        """Fila válida de la factura ``excel_invoice`` (valores sobrescribibles)."""
+        row = dict.fromkeys(EXPECTED_HEADERS, '')
+        row.update({
+            'excel_invoice': excel_invoice,
+            'partner_vat_or_name': self.partner_a.name,
+            'invoice_date': '15-01-2024',
+            'product_code': self.product_a.name,
+            'description': 'Line of %s' % excel_invoice,
+            'quantity': 2,
+            'unit_price': 100.0,
+            'discount': 0,
+            'ref_invoice': 'REF-%s' % excel_invoice,
+            'tipo_gasto': 'compra',
+            'currency': self.company_data['currency'].name,
+            'journal_code': self.journal.code,
+            'account_code': self.account.code,
+            'invoice_type': 'out_invoice',
+        })
+        row.update(values)
+        return row
+
+    def _build_xlsx(self, rows):
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet('Invoices')
+        ws.append(EXPECTED_HEADERS)
+        for row in rows:
+            ws.append([row[name] for name in EXPECTED_HEADERS])
+        file_data = BytesIO()
+        wb.save(file_data)
+        return file_data.getvalue()
+
+    def _build_ndjson(self, rows):
+        return ''.join(json.dumps(row) + '\n' for row in rows).encode('utf-8')
+
+    def _create_wizard(self, content, **values):
+        return self.env['import.invoice.wizard'].create(dict({
+            'files': base64.b64encode(content),
+            'datas_fname': 'invoices.xlsx',
+            'company_id': self.company_data['company'].id,
+            'import_product_by': 'name',
+            'account_option': 'from_excel_account',
+        }, **values))
+
+    def _imported_moves(self, *refs):
+        return self.env['account.move'].search([('ref', 'in', list(refs))])
+
+    # ------------------------------------------------------------
+    # PRUEBAS
+    # ------------------------------------------------------------
+    def test_abort_imports_nothing_on_error(self):
+        content = self._build_xlsx([
+            self._row('A1'),
+            self._row('A2', product_code='Unknown product'),
+        ])
+        wizard = self._create_wizard(content, error_handling='abort')
+        with self.assertRaisesRegex(ValidationError, 'Unknown product'):
+            wizard._with_file_hash(content)._import_all(content)
+        self.assertFalse(self._imported_moves('REF-A1', 'REF-A2'))
+
+    def test_skip_rejects_only_invalid_invoices(self):
+        content = self._build_xlsx([
+            self._row('S1'),
+            self._row('S1', description='Second line'),
+            self._row('S2', quantity='two'),
+            self._row('S3', product_code='Unknown product'),
+        ])
+        wizard = self._create_wizard(content, error_handling='skip')
+        wizard.import_file()
+
+        self.assertEqual(wizard.error_count, 2)
+        self.assertTrue(wizard.error_file)
+        self.assertEqual(wizard.move_ids, self._imported_moves('REF-S1', 'REF-S2', 'REF-S3'))
+        self.assertEqual(wizard.move_ids.ref, 'REF-S1')
+        self.assertEqual(len(wizard.move_ids.invoice_line_ids), 2)
+
+    def test_reimport_skips_fingerprinted_invoices(self):
+        content = self._build_xlsx([self._row('F1'), self._row('F2')])
+        self._create_wizard(content).import_file()
+        moves = self._imported_moves('REF-F1', 'REF-F2')
+        self.assertEqual(len(moves), 2)
+        self.assertTrue(all(moves.mapped('import_fingerprint')))
+
+        self._create_wizard(content).import_file()
+        self.assertEqual(self._imported_moves('REF-F1', 'REF-F2'), moves)
+
+    def test_ndjson_results(self):
+        content = self._build_ndjson([
+            self._row('N1'),
+            self._row('N2', quantity='two'),
+        ])
+        wizard = self._create_wizard(content, batch_size=1).with_context(import_source_format='ndjson')
+
+        results = [result for batch in wizard._iter_ndjson_import(content) for result in batch]
+        status = {result['excel_invoice']: result['status'] for result in results}
+        self.assertEqual(status, {'N1': 'created', 'N2': 'error'})
+
+        results = [result for batch in wizard._iter_ndjson_import(content) for result in batch]
+        status = {result['excel_invoice']: result['status'] for result in results}
+        self.assertEqual(status, {'N1': 'duplicate', 'N2': 'error'})
+
+    def test_ndjson_rejects_invoice_with_invalid_later_row(self):
+        content = self._build_ndjson([
+            self._row('P1'),
+            self._row('P1', tipo_gasto='invalid'),
+            self._row('P2'),
+        ])
+        wizard = self._create_wizard(content).with_context(import_source_format='ndjson')
+
+        results = [result for batch in wizard._iter_ndjson_import(content) for result in batch]
+        status = {result['excel_invoice']: result['status'] for result in results}
+        self.assertEqual(status, {'P1': 'error', 'P2': 'created'})
+        self.assertEqual(self._imported_moves('REF-P1', 'REF-P2').ref, 'REF-P2')
+
+    def test_grouped_items_drop_partial_invoice(self):
+        # Sin la primera pasada: la fila rechazada llega después de una válida
+        # de la misma factura, ya acumulada en la factura en curso.
+        content = self._build_ndjson([
+            self._row('G1'),
+            self._row('G1', tipo_gasto='invalid'),
+            self._row('G2'),
+        ])
+        wizard = self._create_wizard(content).with_context(import_source_format='ndjson')
+        lookups = wizard._prepare_lookups(wizard._iter_data_rows(content, {}), errors=[])
+
+        errors = {}
+        invoices = dict(wizard._iter_grouped_invoice_items(
+            wizard._iter_data_rows(content, errors), lookups, errors))
+        self.assertEqual(list(invoices), ['G2'])
+        self.assertIn('G1', errors)
+
+    def test_partner_write_invalidates_only_its_lookups(self):
+        registry = self.env.registry
+        current = lookup_cache.generation(self.env.cr, 'partner')
+        scope = ('test',)
+        lookup_cache.get_many(registry, 'partner', current, scope, [])
+        lookup_cache.set_many(registry, 'partner', current, scope, {
+            'A': self.partner_a.id,
+            'B': self.partner_b.id,
+        })
+        # Cambios de los datos de prueba (setUpClass), aún sin confirmar
+        self.env.cr.postcommit.data.pop(lookup_cache._PENDING_KEY, None)
+
+        self.partner_a.name = 'Renamed partner'
+        self.partner_b.customer_rank += 1
+        ids, values = self.env.cr.postcommit.data[lookup_cache._PENDING_KEY]['partner']
+        self.assertEqual(ids, set(self.partner_a.ids))
+        self.assertIn('Renamed partner', values)
+
+        # Lo que hace el postcommit en este proceso
+        lookup_cache.invalidate(registry, 'partner', ids, values)
+        self.assertEqual(lookup_cache.get_many(registry, 'partner', current, scope, ['A', 'B']),
+                         {'B': self.partner_b.id})
@@ -0,0 +1,6 @@
+# -*- coding: utf-8 -*-
+from . import excel_reader
+from . import import_profiler
+from . import lookup_cache
+from . import ndjson_reader
+from . import upload_spool
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""
+Lectura en streaming de archivos Excel (.xlsx / .xls) para el importador.
+
+Las filas se entregan como tuplas mediante un generador, de modo que el
+importador procesa las primeras filas antes de que se lean las últimas y
+la memoria no crece con el tamaño del archivo:
+
+    - .xlsx → openpyxl en modo ``read_only`` (lectura fila a fila del XML).
+    - .xls  → xlrd con ``on_demand=True`` (solo se carga la primera hoja).
+
+Las celdas de fecha se entregan como ``datetime`` en ambos formatos.
+
+El origen puede ser el contenido en memoria (bytes), un archivo binario
+abierto o la ruta de un archivo en disco (p. ej. una carga por partes o el
+filestore); con una ruta el archivo nunca se carga completo en memoria.
+"""
+
+import hashlib
+import io
+import os
+
+import xlrd
+from openpyxl import load_workbook
+
+# Firmas de archivo: .xlsx es un ZIP, .xls es un documento OLE2 (BIFF).
+XLSX_SIGNATURE = b'PK\x03\x04'
+XLS_SIGNATURE = b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'
+
+
+# Tamaño de bloque para calcular el hash de archivos en disco
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def _as_stream(source):
+    """Normaliza ``source`` (bytes o archivo binario) a un stream con seek."""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return io.BytesIO(source)
+    return source
+
+
+def source_size(source):
+    """Tamaño en bytes del origen (bytes o ruta)."""
+    if isinstance(source, str):
+        return os.path.getsize(source)
+    return len(source)
+
+
+def source_digest(source):
+    """SHA-256 (hex) del origen; las rutas se leen por bloques."""
+    if not isinstance(source, str):
+        return hashlib.sha256(source).hexdigest()
+    digest = hashlib.sha256()
+    with open(source, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def detect_format(stream):
+    """Devuelve 'xlsx', 'xls' o None según la firma del archivo."""
+    position = stream.tell()
+    signature = stream.read(len(XLS_SIGNATURE))
+    stream.seek(position)
+    if signature.startswith(XLSX_SIGNATURE):
+        return 'xlsx'
+    if signature.startswith(XLS_SIGNATURE):
+        return 'xls'
+    return None
+
+
+def _is_blank(row):
+    """Indica si la fila no contiene ningún valor (filas con solo formato)."""
+    return all(value in (None, '') for value in row)
+
+
+def _iter_xlsx_rows(source):
+    """Itera la primera hoja de un .xlsx sin cargar el libro completo."""
+    workbook = load_workbook(source, read_only=True, data_only=True)
+    try:
+        sheet = workbook.worksheets[0]
+        for row in sheet.iter_rows(values_only=True):
+            if not _is_blank(row):
+                yield row
+    finally:
+        workbook.close()
+
+
+def _iter_xls_rows(source):
+    """Itera la primera hoja de un .xls cargando solo esa hoja (desde una ruta,
+    xlrd mapea el archivo en memoria en lugar de leerlo)."""
+    if isinstance(source, str):
+        workbook = xlrd.open_workbook(filename=source, on_demand=True)
+    else:
+        workbook = xlrd.open_workbook(file_contents=source.read(), on_demand=True)
+    try:
+        sheet = workbook.sheet_by_index(0)
+        for row in range(sheet.nrows):
+            values = sheet.row_values(row)
+            # Las fechas en .xls son números de serie: se convierten a datetime
+            # para entregarlas igual que openpyxl (fechas nativas).
+            for col, ctype in enumerate(sheet.row_types(row)):
+                if ctype == xlrd.XL_CELL_DATE:
+                    try:
+                        values[col] = xlrd.xldate_as_datetime(values[col], workbook.datemode)
+                    except (xlrd.xldate.XLDateError, ValueError):
+                        pass
+            values = tuple(values)
+            if not _is_blank(values):
+                yield values
+    finally:
+        workbook.release_resources()
+
+
+def iter_rows(source):
+    """
+    Generador de filas (tuplas de valores) de la primera hoja del archivo.
+    La primera tupla corresponde a la fila de encabezados; las filas
+    completamente vacías se omiten.
+
+    :param source: contenido del archivo (bytes), archivo binario abierto o
+        ruta del archivo en disco.
+    :raises ValueError: si el contenido no es un .xlsx ni un .xls.
+    """
+    if isinstance(source, str):
+        with open(source, 'rb') as f:
+            file_format = detect_format(f)
+    else:
+        source = _as_stream(source)
+        file_format = detect_format(source)
+    if file_format == 'xlsx':
+        return _iter_xlsx_rows(source)
+    if file_format == 'xls':
+        return _iter_xls_rows(source)
+    raise ValueError("Unsupported spreadsheet format")
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""
+Medición por fase (tiempo y número de consultas SQL) de una importación.
+
+El perfilador viaja en el contexto (``import_profiler``); si no está, los
+métodos del asistente usan ``NULL_PROFILER`` y no miden nada.
+"""
+
+import heapq
+import time
+from contextlib import contextmanager
+
+PHASES = ('parse', 'validate', 'resolve', 'create', 'post')
+
+# Cantidad de filas / lotes más lentos que se conservan
+SLOWEST_LIMIT = 10
+
+
+class ImportProfiler:
+    """Acumula tiempo y consultas por fase, y los elementos más lentos."""
+
+    def __init__(self, cr):
+        self.cr = cr
+        self.started = time.perf_counter()
+        self.times = dict.fromkeys(PHASES, 0.0)
+        self.queries = dict.fromkeys(PHASES, 0)
+        self.row_count = 0
+        self.invoice_count = 0
+        self._slowest = []
+
+    def _query_count(self):
+        return getattr(self.cr, 'sql_log_count', 0)
+
+    @contextmanager
+    def phase(self, name, label=None):
+        """Mide el bloque dentro de la fase ``name``; si se indica ``label``,
+        el bloque compite por la lista de elementos más lentos."""
+        start, queries = time.perf_counter(), self._query_count()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.add(name, elapsed, self._query_count() - queries)
+            if label:
+                self.add_item(label, elapsed)
+
+    def add(self, name, elapsed, queries=0):
+        self.times[name] += elapsed
+        self.queries[name] += queries
+
+    def add_item(self, label, elapsed):
+        """Conserva los ``SLOWEST_LIMIT`` elementos más lentos (min-heap)."""
+        item = (elapsed, label)
+        if len(self._slowest) < SLOWEST_LIMIT:
+            heapq.heappush(self._slowest, item)
+        elif item > self._slowest[0]:
+            heapq.heapreplace(self._slowest, item)
+
+    def slowest(self):
+        return sorted(self._slowest, reverse=True)
+
+    def total_time(self):
+        return time.perf_counter() - self.started
+
+
+class _NullProfiler:
+    """Perfilador vacío: mismas operaciones, sin medición."""
+
+    row_count = 0
+    invoice_count = 0
+
+    def __setattr__(self, name, value):
+        # Los contadores del perfilador vacío no se modifican
+        pass
+
+    @contextmanager
+    def phase(self, name, label=None):
+        yield
+
+    def add(self, name, elapsed, queries=0):
+        pass
+
+    def add_item(self, label, elapsed):
+        pass
+
+
+NULL_PROFILER = _NullProfiler()
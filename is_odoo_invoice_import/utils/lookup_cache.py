@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""
+Caché de resolución de referencias (partners y productos) compartida por las
+importaciones del mismo proceso: {(compañías, campo, valor del Excel): id}.
+
+Solo se guardan valores encontrados. Al confirmarse una transacción que crea,
+modifica (campos de búsqueda) o elimina partners / productos
+(``invalidate_on_commit``):
+    - en este proceso se descartan solo las entradas que apuntan a esos
+      registros o cuyo valor del Excel coincide con sus valores;
+    - los demás procesos lo detectan por la secuencia PostgreSQL del tipo
+      (``generation``), que se incrementa, y vacían la caché de ese tipo.
+
+No se usa ``registry.clear_caches()``, a diferencia de la caché de CAI de
+l10n_hn_fiscal: un CAI cambia pocas veces, mientras que partners y productos
+se editan a diario y ``clear_caches()`` vacía todas las cachés ormcache del
+registro en todos los procesos. Las entradas también se descartan cuando
+cambia la secuencia de cachés del registro.
+"""
+
+import threading
+
+# Entradas máximas por base de datos y tipo; al llenarse se vacía la caché
+MAX_ENTRIES = 200000
+
+# Secuencia de invalidación (una por tipo), ver ``generation``
+SEQUENCE_NAME = 'is_odoo_invoice_import_%s_lookup_seq'
+
+_PENDING_KEY = 'is_odoo_invoice_import.lookup_cache'
+
+_caches = {}
+_lock = threading.Lock()
+
+
+def create_sequence(cr, kind):
+    """Crea la secuencia de invalidación del tipo (``init`` del modelo)."""
+    cr.execute("CREATE SEQUENCE IF NOT EXISTS %s" % (SEQUENCE_NAME % kind))
+
+
+def generation(cr, kind):
+    """Generación vigente del tipo en la base de datos: cambia cada vez que
+    otra transacción confirma un cambio en partners / productos."""
+    cr.execute("SELECT last_value, is_called FROM %s" % (SEQUENCE_NAME % kind))
+    last_value, is_called = cr.fetchone()
+    # Secuencia recién creada: el primer nextval() retorna last_value
+    return last_value if is_called else 0
+
+
+def _get_cache(registry, kind, current=None):
+    """[generación, entradas] del tipo; con ``current`` se vacía si la
+    generación cambió."""
+    key = (registry.db_name, kind)
+    cache = _caches.get(key)
+    if cache is None or cache[0] != registry.cache_sequence:
+        cache = _caches[key] = (registry.cache_sequence, [current, {}])
+    state = cache[1]
+    if current is not None and state[0] != current:
+        state[0] = current
+        state[1].clear()
+    return state
+
+
+def get_many(registry, kind, current, scope, values):
+    """{valor: id} de los ``values`` que están en caché para la generación
+    ``current``."""
+    with _lock:
+        entries = _get_cache(registry, kind, current)[1]
+        found = {}
+        for value in values:
+            record_id = entries.get((scope, value))
+            if record_id:
+                found[value] = record_id
+        return found
+
+
+def set_many(registry, kind, current, scope, mapping):
+    """Guarda {valor: id} para ``scope`` (compañías / campo de búsqueda), si
+    la caché sigue en la generación ``current`` con la que se resolvieron."""
+    with _lock:
+        state = _get_cache(registry, kind)
+        if state[0] != current:
+            return
+        entries = state[1]
+        if len(entries) + len(mapping) > MAX_ENTRIES:
+            entries.clear()
+        for value, record_id in mapping.items():
+            entries[(scope, value)] = record_id
+
+
+def invalidate(registry, kind, ids=(), values=()):
+    """Descarta (en este proceso) las entradas que apuntan a ``ids`` o cuyo
+    valor del Excel está en ``values``."""
+    ids, values = set(ids), set(values)
+    with _lock:
+        entries = _get_cache(registry, kind)[1]
+        stale = [key for key, record_id in entries.items() if record_id in ids or key[1] in values]
+        for key in stale:
+            del entries[key]
+
+
+def invalidate_on_commit(env, kind, records, values):
+    """Registra los registros modificados y sus valores de búsqueda; al
+    confirmarse la transacción se descartan en este proceso y se avisa a los
+    demás. Tras un rollback no se hace nada."""
+    postcommit = env.cr.postcommit
+    if _PENDING_KEY not in postcommit.data:
+        pending = postcommit.data[_PENDING_KEY] = {}
+        registry = env.registry
+        postcommit.add(lambda: _apply_pending(registry, pending))
+    ids, pending_values = postcommit.data[_PENDING_KEY].setdefault(kind, (set(), set()))
+    ids.update(records.ids)
+    pending_values.update(value for value in values if value)
+
+
+def _apply_pending(registry, pending):
+    with registry.cursor() as cr:
+        for kind, (ids, values) in pending.items():
+            invalidate(registry, kind, ids, values)
+            cr.execute("SELECT nextval(%s)", [SEQUENCE_NAME % kind])
+            new = cr.fetchone()[0]
+            with _lock:
+                state = _get_cache(registry, kind)
+                # Nadie más incrementó la secuencia: las entradas de este
+                # proceso ya están al día, se conservan.
+                if state[0] == new - 1:
+                    state[0] = new
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+"""
+Lectura en streaming de registros JSON Lines (NDJSON) para el importador.
+
+Cada línea es un objeto JSON con las mismas claves que los encabezados del
+Excel. Las filas se entregan igual que las de una hoja (primero la fila de
+encabezados y luego una lista de valores por registro), de modo que el
+resto del importador (validación, resolución y creación) no cambia.
+"""
+
+import io
+import json
+
+
+def _open_text(source):
+    """Abre el origen (bytes o ruta) como texto UTF-8."""
+    if isinstance(source, str):
+        return open(source, encoding='utf-8')
+    return io.TextIOWrapper(io.BytesIO(source), encoding='utf-8')
+
+
+def iter_rows(source, headers):
+    """Generador de filas: ``headers`` y luego los valores de cada registro
+    en ese orden (las claves ausentes se entregan como None).
+
+    :raises ValueError: si una línea no es un objeto JSON válido.
+    """
+    headers = list(headers)
+    yield headers
+    with _open_text(source) as f:
+        for line_no, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                raise ValueError("Invalid JSON at line %s" % line_no)
+            if not isinstance(record, dict):
+                raise ValueError("Line %s is not a JSON object" % line_no)
+            yield [record.get(name) for name in headers]
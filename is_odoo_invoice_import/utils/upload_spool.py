@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""
+Almacenamiento temporal (spool) de archivos subidos por partes.
+
+Cada carga se identifica con un token (uuid4 hex) y se guarda en
+``<tmp>/odoo_invoice_import/<base de datos>/<uid>/<token>.upload``: el token
+solo es válido para el usuario que hizo la carga. El importador lee el
+archivo directamente desde esta ruta, sin pasarlo a base64 ni a memoria.
+
+Al importarse en segundo plano, la carga se traslada a
+``<tmp>/odoo_invoice_import/<base de datos>/jobs/`` (``claim``), fuera de la
+limpieza de cargas abandonadas, y el trabajo la lee desde ahí.
+"""
+
+import os
+import re
+import shutil
+import tempfile
+import time
+import uuid
+
+SPOOL_ROOT = os.path.join(tempfile.gettempdir(), 'odoo_invoice_import')
+
+# Las cargas sin usar se eliminan pasado este tiempo (segundos)
+SPOOL_MAX_AGE = 24 * 3600
+
+COPY_BUFFER_SIZE = 1024 * 1024
+
+_TOKEN_RE = re.compile(r'^[0-9a-f]{32}$')
+
+
+def new_token():
+    return uuid.uuid4().hex
+
+
+def is_valid_token(token):
+    return bool(token and _TOKEN_RE.match(token))
+
+
+def _db_dir(dbname):
+    return os.path.join(SPOOL_ROOT, re.sub(r'[^\w.-]', '_', dbname))
+
+
+def _spool_dir(dbname, uid):
+    return os.path.join(_db_dir(dbname), str(int(uid)))
+
+
+def _jobs_dir(dbname):
+    return os.path.join(_db_dir(dbname), 'jobs')
+
+
+def spool_path(dbname, uid, token):
+    """Ruta del archivo de la carga ``token`` del usuario ``uid``."""
+    if not is_valid_token(token):
+        raise ValueError("Invalid upload token")
+    return os.path.join(_spool_dir(dbname, uid), '%s.upload' % token)
+
+
+def write_chunk(dbname, uid, token, offset, stream):
+    """Escribe una parte de la carga en ``offset`` copiando el stream por
+    bloques (la parte nunca se carga completa en memoria).
+
+    :return: tamaño actual del archivo.
+    """
+    if offset < 0:
+        raise ValueError("Invalid upload offset")
+    path = spool_path(dbname, uid, token)
+    os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+    if offset == 0:
+        cleanup(dbname, uid)
+    mode = 'r+b' if os.path.exists(path) else 'wb'
+    with open(path, mode) as f:
+        if offset > os.fstat(f.fileno()).st_size:
+            raise ValueError("Upload offset beyond current size")
+        f.seek(offset)
+        shutil.copyfileobj(stream, f, COPY_BUFFER_SIZE)
+        f.truncate()
+        return f.tell()
+
+
+def claim(dbname, uid, token):
+    """Traslada la carga a la carpeta de trabajos en segundo plano (sin
+    copiarla) y retorna la nueva ruta."""
+    path = spool_path(dbname, uid, token)
+    directory = _jobs_dir(dbname)
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    target = os.path.join(directory, os.path.basename(path))
+    os.replace(path, target)
+    return target
+
+
+def is_claimed(dbname, path):
+    """La ruta es una carga trasladada por ``claim``."""
+    return bool(path) and os.path.dirname(path) == _jobs_dir(dbname)
+
+
+def remove(dbname, uid, token):
+    try:
+        os.remove(spool_path(dbname, uid, token))
+    except (OSError, ValueError):
+        pass
+
+
+def cleanup(dbname, uid, max_age=SPOOL_MAX_AGE):
+    """Elimina las cargas abandonadas del usuario."""
+    directory = _spool_dir(dbname, uid)
+    limit = time.time() - max_age
+    try:
+        entries = list(os.scandir(directory))
+    except OSError:
+        return
+    for entry in entries:
+        try:
+            if entry.is_file() and entry.stat().st_mtime < limit:
+                os.remove(entry.path)
+        except OSError:
+            pass
@@ -25,15 +25,23 @@
 ##############################################################################
 
 import base64
-import xlrd
+import hashlib
+import itertools
+import os
+import time
 from io import BytesIO
+import xlsxwriter
 from openpyxl import Workbook
 from openpyxl.worksheet.datavalidation import DataValidation
 from openpyxl.styles import Font, PatternFill
 from odoo import models, fields, api, _
 from odoo.exceptions import ValidationError
-from datetime import datetime
-from odoo.tools import DEFAULT_SERVER_DATE_FORMAT
+from datetime import date, datetime
+from functools import lru_cache
+from odoo.tools import DEFAULT_SERVER_DATE_FORMAT, html2plaintext
+from odoo.modules.module import get_manifest
+from ..utils import excel_reader, lookup_cache, ndjson_reader, upload_spool
+from ..utils.import_profiler import ImportProfiler, NULL_PROFILER
 
 # ------------------------------------------------------------
 # ENCABEZADOS ESPERADOS DEL EXCEL
@@ -46,6 +54,82 @@ EXPECTED_HEADERS = [
     'journal_code', 'account_code', 'invoice_type', 'payment_ref', 'accounting_date'
 ]
 
+TEMPLATE_FILENAME = 'invoice_import_template.xlsx'
+TEMPLATE_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+# Exportación de facturas al formato de la plantilla
+EXPORT_FILENAME = 'invoice_export.xlsx'
+EXPORT_BATCH_SIZE = 1000
+EXPORT_DATE_FORMAT = '%d-%m-%Y'
+
+# Plantilla ya generada, por (idioma, versión del módulo). Se regenera al
+# actualizar el módulo porque la versión forma parte de la clave.
+_TEMPLATE_CACHE = {}
+
+# ------------------------------------------------------------
+# CONVERSIÓN DE CELDAS POR TIPO DE COLUMNA
+# ------------------------------------------------------------
+def _to_text(value):
+    """🔤 Texto plano (celda vacía → '')."""
+    if value is None:
+        return ''
+    return str(value).strip()
+
+
+def _to_integer_text(value):
+    """🧮 Número sin decimales: quita el ".0" de los valores numéricos."""
+    if isinstance(value, float):
+        return str(int(value))
+    return _to_text(value)
+
+
+def _to_decimal_text(value):
+    """💲 Número con decimales: hasta 6 decimales para precios."""
+    if value in (None, ''):
+        return ''
+    try:
+        return str(round(float(value), 6))
+    except Exception:
+        return '0'
+
+
+def _to_date_value(value):
+    """📅 Fecha: las fechas nativas de Excel se conservan como ``date``; el
+    texto se interpreta luego en ``_parse_date``."""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return _to_text(value)
+
+
+DATE_FORMATS = ('%d-%m-%Y', '%Y-%m-%d', '%d/%m/%Y')
+
+
+@lru_cache(maxsize=8192)
+def _parse_date_text(value):
+    """Interpreta una fecha en texto (memoizado: los mismos valores se repiten
+    en miles de filas). Retorna la fecha en formato Odoo o None."""
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).strftime(DEFAULT_SERVER_DATE_FORMAT)
+        except ValueError:
+            continue
+    return None
+
+
+COLUMN_CONVERTERS = {
+    'excel_invoice': _to_integer_text,
+    'partner_vat_or_name': _to_integer_text,
+    'quantity': _to_integer_text,
+    'account_code': _to_integer_text,
+    'unit_price': _to_decimal_text,
+    'discount': _to_decimal_text,
+    'invoice_date': _to_date_value,
+    'invoice_date_due': _to_date_value,
+    'accounting_date': _to_date_value,
+}
+
 
 class ImportInvoiceWizard(models.TransientModel):
     _name = 'import.invoice.wizard'
@@ -83,137 +167,775 @@ class ImportInvoiceWizard(models.TransientModel):
         default='from_excel_account'
     )
 
+    batch_size = fields.Integer(
+        string='Batch Size',
+        default=500,
+        help="Number of invoices created (and posted) per create() call."
+    )
+
+    error_handling = fields.Selection([
+        ('abort', 'Abort the Import on the First Error'),
+        ('skip', 'Skip Invoices with Errors')],
+        string='Error Handling',
+        default='abort',
+        help="Skip: each invoice (excel_invoice) is created in its own savepoint; "
+             "invoices with errors are skipped and returned in an error workbook."
+    )
+
     files = fields.Binary(string="Import Excel File")
     datas_fname = fields.Char('Select Excel File')
 
+    # Archivo subido por partes (ruta /odoo_import_invoice/upload): se lee
+    # desde disco en lugar del campo binario ``files``.
+    upload_token = fields.Char(copy=False)
+
+    # Resultado de la importación con errores (modo 'skip')
+    move_ids = fields.Many2many('account.move', string='Created Invoices', readonly=True)
+
+    # Facturas a exportar al formato de la plantilla (acción "Export to Import Template")
+    export_move_ids = fields.Many2many('account.move', 'import_invoice_wizard_export_move_rel',
+                                       string='Invoices to Export', readonly=True)
+    error_count = fields.Integer(string='Rejected Invoices', readonly=True)
+    error_file = fields.Binary(string='Rejected Rows', readonly=True)
+    error_file_name = fields.Char(readonly=True)
+
+    # Resultado de la validación sin importar ("Check File")
+    check_report = fields.Text(string='Check Result', readonly=True)
+
+    # Vista previa de las primeras filas ("Preview")
+    preview_rows = fields.Integer(string='Preview Rows', default=20)
+    preview_report = fields.Text(string='Preview', readonly=True)
+
     # ------------------------------------------------------------
     # MÉTODO PRINCIPAL DE IMPORTACIÓN
     # ------------------------------------------------------------
     def import_file(self):
         """Importar facturas desde un archivo Excel validado."""
+        content = self._get_file_source()
+        profiler = ImportProfiler(self.env.cr)
+        self = self._with_file_hash(content).with_context(import_profiler=profiler)
         try:
-            workbook = xlrd.open_workbook(file_contents=base64.decodebytes(self.files))
-        except Exception:
-            raise ValidationError(_("Please select a valid .xls or .xlsx file."))
+            if self.error_handling == 'skip':
+                action = self._import_skipping_errors(content)
+            else:
+                action = self._import_all(content)
+        except Exception as e:
+            self._log_import(content, profiler, error=e)
+            raise
+        self._log_import(content, profiler)
+        if isinstance(content, str):
+            # Archivo subido por partes: se elimina solo si la importación se
+            # confirma (tras un rollback el usuario puede reintentar).
+            dbname, uid, token = self.env.cr.dbname, self.env.uid, self.upload_token
+            self.env.cr.postcommit.add(lambda: upload_spool.remove(dbname, uid, token))
+        return action
 
-        sheet = workbook.sheet_by_index(0)
-        self._validate_headers(sheet)
+    def _import_all(self, content):
+        """Importa todo el archivo en una sola transacción (modo 'abort')."""
+        # Primera pasada: valores distintos de cada referencia → mapas en memoria
+        grouping = {}
+        lookups = self._prepare_lookups(self._track_grouping(self._iter_data_rows(content), grouping))
 
         with self.env.cr.savepoint():
-            created_moves = self._process_rows(sheet)
+            created_moves = self._process_rows(
+                self._iter_data_rows(content), lookups, grouped=grouping['contiguous'])
 
         return self._open_created_invoices(created_moves)
 
+    def _import_skipping_errors(self, content):
+        """Importa aislando cada factura: las que fallan se omiten y sus filas
+        se devuelven en un Excel con una columna de error."""
+        errors = {}
+        lookups = self._prepare_lookups(self._iter_data_rows(content, errors), errors=[])
+        invoices = self._build_invoice_vals(self._iter_data_rows(content, errors), lookups, errors)
+
+        with self.env.cr.savepoint():
+            created_moves = self._create_moves_isolated(invoices, errors)
+
+        if not errors:
+            return self._open_created_invoices(created_moves)
+
+        self.write({
+            'move_ids': [(6, 0, created_moves.ids)],
+            'error_count': len(errors),
+            'error_file': base64.b64encode(self._build_error_workbook(content, errors)),
+            'error_file_name': 'rejected_rows.xlsx',
+        })
+        return self._reopen_wizard()
+
+    def _iter_ndjson_import(self, content):
+        """Importa registros JSON Lines (una factura puede tener varias líneas)
+        y entrega, lote por lote, el resultado de cada factura.
+
+        Usa el mismo flujo que ``import_file`` (validación, resolución en
+        bloque y creación por lotes), aislando cada factura como en el modo
+        'skip'. Quien consume el generador decide cuándo confirmar (commit).
+        """
+        profiler = ImportProfiler(self.env.cr)
+        self = self._with_file_hash(content).with_context(
+            import_profiler=profiler, import_source_format='ndjson')
+        try:
+            yield from self._iter_import_results(content)
+        except Exception as e:
+            self._log_import(content, profiler, error=e)
+            raise
+        self._log_import(content, profiler)
+
+    def _iter_import_results(self, content):
+        """Generador de listas de resultados, un lote por cada ``batch_size``
+        facturas, precedido de las facturas rechazadas hasta ese momento.
+
+        Si las filas de cada factura están juntas, los valores de cada lote se
+        construyen a medida que se lee el archivo: el primer resultado se
+        entrega sin haber construido las facturas siguientes.
+        """
+        errors = {}
+        grouping = {}
+        lookups = self._prepare_lookups(
+            self._track_grouping(self._iter_data_rows(content, errors), grouping), errors=[])
+        if grouping['contiguous']:
+            invoices = self._iter_grouped_invoice_items(self._iter_data_rows(content, errors), lookups, errors)
+        else:
+            invoices = iter(self._build_invoice_vals(self._iter_data_rows(content, errors), lookups, errors).items())
+
+        batch_size = max(self.batch_size or 0, 1)
+        reported = set()
+        while True:
+            batch = list(itertools.islice(invoices, batch_size))
+            results = [self._get_import_result(key, error=message)
+                       for key, message in errors.items() if key not in reported]
+            reported.update(errors)
+            if batch:
+                results += self._create_result_batch(batch)
+            if results:
+                yield results
+            if not batch:
+                break
+            self.env.invalidate_all()
+
+    def _iter_grouped_invoice_items(self, data_rows, lookups, errors):
+        """(excel_invoice, valores) de filas agrupadas, entregada cada factura
+        en cuanto aparece la siguiente clave. Una fila con error descarta su
+        factura y el error se registra en ``errors``.
+
+        Las filas que ``_iter_data_rows`` rechaza no llegan aquí: si no es la
+        primera fila de la factura, las anteriores ya están en ``current``, por
+        eso al entregar se descartan las facturas registradas en ``errors``.
+        """
+        current = {}
+        for row, data in data_rows:
+            key = data['excel_invoice']
+            if current and key not in current:
+                yield from ((k, vals) for k, vals in current.items() if k not in errors)
+                current = {}
+            if key in errors:
+                continue
+            try:
+                self._add_row_to_invoice(current, row, data, lookups)
+            except ValidationError as e:
+                errors[key] = self._get_error_message(e)
+                current.pop(key, None)
+        yield from ((k, vals) for k, vals in current.items() if k not in errors)
+
+    def _create_result_batch(self, batch):
+        """Crea un lote de (excel_invoice, valores) aislando cada factura y
+        retorna el resultado de cada una."""
+        batch_errors = {}
+        moves = self._create_moves_isolated(dict(batch), batch_errors)
+        moves_by_fingerprint = {move.import_fingerprint: move for move in moves}
+        results = []
+        for key, vals in batch:
+            if key in batch_errors:
+                results.append(self._get_import_result(key, error=batch_errors[key]))
+            else:
+                results.append(self._get_import_result(
+                    key, move=moves_by_fingerprint.get(vals.get('import_fingerprint'))))
+        return results
+
+    def _get_import_result(self, key, move=None, error=None):
+        """Resultado de una factura: creada, rechazada o ya importada antes."""
+        if error:
+            return {'excel_invoice': key, 'status': 'error', 'error': error}
+        if not move:
+            return {'excel_invoice': key, 'status': 'duplicate'}
+        return {
+            'excel_invoice': key,
+            'status': 'created',
+            'move_id': move.id,
+            'name': move.name,
+            'state': move.state,
+        }
+
+    def action_check_file(self):
+        """Valida todo el archivo sin crear facturas (encabezados, filas,
+        fechas y referencias) y muestra todos los errores y un resumen."""
+        content = self._get_file_source()
+        errors = []
+        summary = {'invoices': set(), 'lines': 0, 'totals': {}}
+        self._prepare_lookups(self._iter_checked_rows(content, errors, summary), errors=errors)
+
+        report = [
+            _("Invoices: %s") % len(summary['invoices']),
+            _("Lines: %s") % summary['lines'],
+        ]
+        for currency, total in sorted(summary['totals'].items()):
+            report.append(_("Untaxed total %s: %s") % (currency or '-', '{:,.2f}'.format(total)))
+        report.append('')
+        if errors:
+            report.append(_("%s error(s) found:") % len(errors))
+            report += errors
+        else:
+            report.append(_("No errors found. The file is ready to be imported."))
+
+        self.check_report = "\n".join(report)
+        return self._reopen_wizard()
+
+    def action_preview(self):
+        """Muestra las primeras ``preview_rows`` filas agrupadas por
+        excel_invoice, con los nombres de partner, producto y cuenta ya
+        resueltos. Solo se leen esas filas del archivo."""
+        content = self._get_file_source()
+        errors = []
+        data_rows = []
+        rows = self._iter_file_rows(content)
+        try:
+            header_row, readers = self._prepare_column_readers(rows)
+            for row, values in itertools.islice(enumerate(rows, start=1), max(self.preview_rows, 1)):
+                data = self._read_row(values, readers)
+                try:
+                    self._validate_row(data, row)
+                except ValidationError as e:
+                    errors.append(self._get_error_message(e))
+                    continue
+                data_rows.append((row, data))
+        finally:
+            rows.close()
+
+        lookups = self._prepare_lookups(data_rows, errors=errors)
+        invoices = {}
+        for row, data in data_rows:
+            invoices.setdefault(data['excel_invoice'], []).append((row, data))
+
+        report = [_("First %s row(s), %s invoice(s):") % (len(data_rows), len(invoices)), '']
+        for key, invoice_rows in invoices.items():
+            report += self._get_preview_lines(key, invoice_rows, lookups)
+        if errors:
+            report.append(_("%s error(s) found:") % len(errors))
+            report += errors
+
+        self.preview_report = "\n".join(report)
+        return self._reopen_wizard()
+
+    def _get_preview_lines(self, key, invoice_rows, lookups):
+        """Líneas de la vista previa de una factura: cabecera y una línea por fila."""
+        first = invoice_rows[0][1]
+        partner = lookups['partner'].get(first['partner_vat_or_name'])
+        journal = lookups['journal'].get(first['journal_code'])
+        lines = ["%s · %s · %s · %s · %s" % (
+            key,
+            partner.display_name if partner else _("Partner not found: %s") % first['partner_vat_or_name'],
+            first['invoice_type'],
+            first['invoice_date'],
+            journal.name if journal else _("Invalid journal code: %s") % first['journal_code'],
+        )]
+        for row, data in invoice_rows:
+            product = lookups['product'].get(data['product_code'])
+            try:
+                account = self._resolve_account(data, lookups, product) if product else None
+            except ValidationError:
+                account = None
+            lines.append("    %s %s: %s · %s x %s · %s" % (
+                _("Row"), row + 1,
+                product.display_name if product else self._get_lookup_error('product', data['product_code']),
+                data['quantity'], data['unit_price'],
+                account.display_name if account else _("No account"),
+            ))
+        lines.append('')
+        return lines
+
+    def _iter_checked_rows(self, content, errors, summary):
+        """Como ``_iter_data_rows`` pero sin detenerse en la primera fila
+        inválida: registra cada error en ``errors`` y acumula el resumen."""
+        rows = self._iter_file_rows(content)
+        header_row, readers = self._prepare_column_readers(rows)
+        for row, values in enumerate(rows, start=1):
+            data = self._read_row(values, readers)
+            try:
+                self._validate_row(data, row)
+                self._parse_row_dates(data, row)
+                subtotal = (float(data['quantity'] or 0) * float(data['unit_price'] or 0)
+                            * (1 - float(data['discount'] or 0) / 100.0))
+            except ValidationError as e:
+                errors.append(self._get_error_message(e))
+                continue
+            except ValueError:
+                errors.append(_("Invalid quantity at row %s") % (row + 1))
+                continue
+
+            summary['invoices'].add(data['excel_invoice'])
+            summary['lines'] += 1
+            summary['totals'][data['currency']] = summary['totals'].get(data['currency'], 0.0) + subtotal
+            yield row, data
+
+    def _reopen_wizard(self):
+        return {
+            'type': 'ir.actions.act_window',
+            'res_model': self._name,
+            'res_id': self.id,
+            'view_mode': 'form',
+            'target': 'new',
+        }
+
+    def action_open_created_invoices(self):
+        return self._open_created_invoices(self.move_ids)
+
+    def action_import_background(self):
+        """Encola el archivo como un trabajo de importación en segundo plano.
+        Un archivo subido por partes se entrega al trabajo por su ruta (sin
+        leerlo a memoria); el contenido del campo ``files`` se adjunta."""
+        source = self._get_file_source()
+        job = self.env['import.invoice.job'].create({
+            'name': self.datas_fname or _("Invoice import"),
+            'file_name': self.datas_fname,
+            'company_id': self.company_id.id,
+            'import_product_by': self.import_product_by,
+            'account_option': self.account_option,
+            'invoice_stage_option': self.invoice_stage_option,
+            'batch_size': self.batch_size,
+        })
+        if isinstance(source, str):
+            job.source_path = upload_spool.claim(self.env.cr.dbname, self.env.uid, self.upload_token)
+        else:
+            job._attach_file(source)
+        job.action_queue()
+        return job._get_form_action()
+
+    def _get_file_source(self):
+        """Origen del archivo a importar: la ruta del archivo subido por partes
+        (leído desde disco) o el contenido decodificado del campo ``files``."""
+        if self.upload_token:
+            try:
+                path = upload_spool.spool_path(self.env.cr.dbname, self.env.uid, self.upload_token)
+            except ValueError:
+                path = None
+            if not path or not os.path.isfile(path):
+                raise ValidationError(_("The uploaded file is no longer available. Please upload it again."))
+            return path
+        if not self.files:
+            raise ValidationError(_("Please select a valid .xls or .xlsx file."))
+        return base64.b64decode(self.files)
+
+    def _with_file_hash(self, content):
+        """Agrega al contexto el hash del archivo, base de la huella de
+        importación de cada factura (reimportación idempotente)."""
+        return self.with_context(import_file_hash=excel_reader.source_digest(content))
+
+    def _get_import_profiler(self):
+        return self.env.context.get('import_profiler') or NULL_PROFILER
+
+    def _log_import(self, content, profiler, error=None):
+        """Registra la ejecución en el historial (import.invoice.log). Si la
+        importación falló, se registra con un cursor propio para que el
+        registro sobreviva al rollback."""
+        vals = dict(
+            self.env['import.invoice.log']._prepare_log_vals(profiler),
+            name=self.datas_fname,
+            company_id=self.company_id.id,
+            invoice_stage_option=self.invoice_stage_option,
+            error_handling=self.error_handling,
+            module_version=get_manifest(__name__.split('.')[2]).get('version'),
+            file_size=excel_reader.source_size(content),
+            invoice_count=profiler.invoice_count,
+            state='failed' if error else 'done',
+            error_message=self._get_error_message(error) if error else False,
+        )
+        if not error:
+            self.env['import.invoice.log'].sudo().create(vals)
+            return
+        with self.pool.cursor() as cr:
+            self.env(cr=cr)['import.invoice.log'].sudo().create(vals)
+
+    def _iter_file_rows(self, content):
+        """Generador de filas del archivo subido (.xlsx en modo read_only,
+        .xls con carga bajo demanda). La primera fila son los encabezados.
+
+        Con ``import_source_format='ndjson'`` en el contexto, el origen son
+        registros JSON Lines en lugar de un Excel.
+
+        :param content: contenido (bytes) o ruta del archivo en disco.
+        """
+        if self.env.context.get('import_source_format') == 'ndjson':
+            return ndjson_reader.iter_rows(content, EXPECTED_HEADERS)
+        try:
+            return excel_reader.iter_rows(content)
+        except Exception:
+            raise ValidationError(_("Please select a valid .xls or .xlsx file."))
+
+    def _read_headers(self, rows):
+        """Consume la fila de encabezados del generador de filas."""
+        try:
+            return next(rows)
+        except StopIteration:
+            raise ValidationError(_("The Excel file is empty."))
+        except Exception:
+            raise ValidationError(_("Please select a valid .xls or .xlsx file."))
+
+    def _iter_data_rows(self, content, errors=None, start_row=0):
+        """Generador de (fila, datos) ya leídos y validados, en streaming.
+
+        La fila de encabezados se valida antes de entregar la primera fila de
+        datos; ``fila`` es el índice de la hoja (0 = encabezados).
+
+        :param errors: si se indica, las filas inválidas no detienen la lectura:
+            se omiten y el error se registra como {excel_invoice: mensaje}.
+        :param start_row: las filas hasta esta (inclusive) se saltan sin
+            convertirlas ni validarlas (reanudación de trabajos).
+        """
+        profiler = self._get_import_profiler()
+        rows = self._iter_file_rows(content)
+        header_row, readers = self._prepare_column_readers(rows)
+        start = time.perf_counter()
+        for row, values in enumerate(rows, start=1):
+            if row <= start_row:
+                continue
+            data = self._read_row(values, readers)
+            parsed = time.perf_counter()
+            try:
+                self._validate_row(data, row)
+            except ValidationError as e:
+                if errors is None:
+                    raise
+                errors.setdefault(data['excel_invoice'], self._get_error_message(e))
+                continue
+            finally:
+                validated = time.perf_counter()
+                profiler.add('parse', parsed - start)
+                profiler.add('validate', validated - parsed)
+                profiler.add_item("row %s" % (row + 1), validated - start)
+                profiler.row_count = max(profiler.row_count, row)
+            yield row, data
+            start = time.perf_counter()
+
+    def _track_grouping(self, data_rows, grouping):
+        """Deja pasar las filas e indica en ``grouping['contiguous']`` si las
+        filas de cada excel_invoice están juntas (archivo ordenado/agrupado)."""
+        seen = set()
+        last_key = None
+        grouping['contiguous'] = True
+        for row, data in data_rows:
+            key = data['excel_invoice']
+            if key != last_key:
+                if key in seen:
+                    grouping['contiguous'] = False
+                seen.add(key)
+                last_key = key
+            yield row, data
+
     # ------------------------------------------------------------
     # PROCESAR TODAS LAS FILAS DEL EXCEL
     # ------------------------------------------------------------
-    def _process_rows(self, sheet):
-        """Procesa cada fila del Excel y crea facturas agrupadas por excel_invoice."""
-        currency_obj = self.env['res.currency']
-        tax_obj = self.env['account.tax']
-        product_obj = self.env['product.product']
-        partner_obj = self.env['res.partner']
-        product_account = self.env['account.account']
+    def _process_rows(self, data_rows, lookups, grouped=False):
+        """Procesa cada fila del Excel y crea facturas agrupadas por excel_invoice.
 
-        number_of_rows = sheet.nrows
+        :param grouped: las filas de cada factura son contiguas; cada factura se
+            envía al lote de creación en cuanto cambia la clave, de modo que la
+            memoria depende del tamaño de lote y no del tamaño del archivo.
+            Si no, se acumulan todas las facturas y se crean al final.
+        """
+        if grouped:
+            return self._create_moves_streaming(self._iter_grouped_invoice_vals(data_rows, lookups))
+        invoices = self._build_invoice_vals(data_rows, lookups)
+        return self._create_moves(list(invoices.values()))
+
+    def _iter_grouped_invoice_vals(self, data_rows, lookups):
+        """Generador de valores de factura para filas agrupadas por excel_invoice:
+        cada factura se entrega en cuanto aparece la siguiente clave."""
+        for last_row, vals in self._iter_grouped_invoice_rows(data_rows, lookups):
+            yield vals
+
+    def _iter_grouped_invoice_rows(self, data_rows, lookups):
+        """Como ``_iter_grouped_invoice_vals``, pero entrega (última fila de la
+        factura, valores): la fila sirve de punto de reanudación."""
+        current = {}
+        last_row = 0
+        for row, data in data_rows:
+            if current and data['excel_invoice'] not in current:
+                yield from ((last_row, vals) for vals in current.values())
+                current = {}
+            self._add_row_to_invoice(current, row, data, lookups)
+            last_row = row
+        yield from ((last_row, vals) for vals in current.values())
+
+    def _build_invoice_vals(self, data_rows, lookups, errors=None):
+        """Agrupa las filas por excel_invoice y construye los valores de cada factura.
+
+        :param data_rows: iterable de (fila, datos) consumido en streaming.
+        :param lookups: mapas de referencias resueltas por ``_prepare_lookups``;
+            aquí solo se hacen búsquedas en diccionarios, sin consultas.
+        :param errors: si se indica, una fila con error descarta su factura
+            completa (se registra en ``errors``) en lugar de detener la importación.
+        :return: dict {excel_invoice: valores}, en el orden del archivo.
+        """
         invoice_dict = {}
-        invoice_lists = []
 
-        row = 1
-        while row < number_of_rows:
-            data = self._read_row(sheet, row)
-            self._validate_row(data, row)
-
-            # Resolución de datos principales
-            partner = self._resolve_partner(data['partner_vat_or_name'], partner_obj)
-            product = self._resolve_product(data['product_code'], product_obj)
-            currency = currency_obj.search([('name', '=', data['currency'])], limit=1)
-            if not currency:
-                raise ValidationError(_("Invalid currency at row %s") % (row + 1))
-            journal = self._resolve_journal(data['journal_code'])
-            taxes = self._resolve_taxes(data['taxes'], tax_obj)
-            account = self._resolve_account(data, product_account, product)
-
-            # Fechas: emisión, vencimiento y contable
-            invoice_date = self._parse_date(data['invoice_date'], row, "invoice_date")
-            due_date = self._parse_date(data['invoice_date_due'], row, "invoice_date_due") if data[
-                'invoice_date_due'] else None
-            accounting_date = self._parse_date(data['accounting_date'] or data['invoice_date'], row, "accounting_date")
-
-            # Crear cabecera si no existe
-            if data['excel_invoice'] not in invoice_dict:
-                vals = self._prepare_invoice_vals(
-                    data, partner, journal, currency,
-                    invoice_date, accounting_date, due_date
-                )
-                invoice_dict[data['excel_invoice']] = vals
-                invoice_lists.append(data['excel_invoice'])
-            else:
-                vals = invoice_dict[data['excel_invoice']]
+        for row, data in data_rows:
+            if errors is None:
+                self._add_row_to_invoice(invoice_dict, row, data, lookups)
+                continue
+            if data['excel_invoice'] in errors:
+                continue
+            try:
+                self._add_row_to_invoice(invoice_dict, row, data, lookups)
+            except ValidationError as e:
+                errors[data['excel_invoice']] = self._get_error_message(e)
+                invoice_dict.pop(data['excel_invoice'], None)
+
+        if errors:
+            for key in errors:
+                invoice_dict.pop(key, None)
+        return invoice_dict
+
+    def _add_row_to_invoice(self, invoice_dict, row, data, lookups):
+        """Agrega la fila a su factura (creando la cabecera si no existe)."""
+        # Resolución de datos principales (ya pre-resueltos)
+        partner = self._lookup(lookups, 'partner', data['partner_vat_or_name'])
+        product = self._lookup(lookups, 'product', data['product_code'])
+        currency = self._lookup(lookups, 'currency', data['currency'])
+        journal = self._lookup(lookups, 'journal', data['journal_code'])
+        taxes = self._get_tax_ids(data['taxes'], lookups)
+        account = self._resolve_account(data, lookups, product)
+
+        # Fechas: emisión, vencimiento y contable
+        invoice_date, due_date, accounting_date = self._parse_row_dates(data, row)
+
+        # Crear cabecera si no existe
+        if data['excel_invoice'] not in invoice_dict:
+            vals = self._prepare_invoice_vals(
+                data, partner, journal, currency,
+                invoice_date, accounting_date, due_date
+            )
+            invoice_dict[data['excel_invoice']] = vals
+        else:
+            vals = invoice_dict[data['excel_invoice']]
 
-            # Agregar línea de factura
-            line_vals = self._prepare_line_vals(data, product, taxes, account)
-            vals['invoice_line_ids'].append((0, 0, line_vals))
-            vals['narration'] = (vals['narration'] + ', ' + data['comment']).strip(', ')
-            row += 1
+        # Agregar línea de factura
+        line_vals = self._prepare_line_vals(data, product, taxes, account)
+        vals['invoice_line_ids'].append((0, 0, line_vals))
+        vals['narration'] = (vals['narration'] + ', ' + data['comment']).strip(', ')
 
-        # Crear facturas en Odoo
+    # ------------------------------------------------------------
+    # CREACIÓN EN LOTES
+    # ------------------------------------------------------------
+    def _create_moves(self, vals_list):
+        """Crea las facturas en lotes de ``batch_size`` con ``create(vals_list)``."""
+        created_moves = self.env['account.move']
+        for batch in self._split_batches(vals_list):
+            created_moves |= self._flush_move_batch(batch)
+        return created_moves
+
+    def _create_moves_streaming(self, vals_iter):
+        """Crea las facturas a medida que llegan, en lotes de ``batch_size``.
+        La caché del ORM se libera tras cada lote para mantener la memoria acotada."""
+        batch_size = max(self.batch_size or 0, 1)
+        created_ids = []
+        batch = []
+        for vals in vals_iter:
+            batch.append(vals)
+            if len(batch) >= batch_size:
+                created_ids += self._flush_move_batch(batch).ids
+                self.env.invalidate_all()
+                batch = []
+        if batch:
+            created_ids += self._flush_move_batch(batch).ids
+        return self.env['account.move'].browse(created_ids)
+
+    def _create_moves_isolated(self, invoices, errors):
+        """Crea las facturas por lotes; si un lote falla, reintenta cada factura
+        del lote en su propio savepoint y registra las que fallan en ``errors``.
+        """
         created_moves = self.env['account.move']
-        for invoice in invoice_lists:
-            move = self.env['account.move'].sudo().create(invoice_dict[invoice])
-            if self.invoice_stage_option == 'validate':
-                move.action_post()
-            created_moves += move
+        for batch in self._split_batches(list(invoices.items())):
+            try:
+                with self.env.cr.savepoint():
+                    created_moves |= self._flush_move_batch([vals for key, vals in batch])
+                continue
+            except Exception:
+                pass
+            for key, vals in batch:
+                try:
+                    with self.env.cr.savepoint():
+                        created_moves |= self._flush_move_batch([vals])
+                except Exception as e:
+                    errors[key] = self._get_error_message(e)
         return created_moves
 
+    def _split_batches(self, vals_list):
+        """Divide la lista de valores de factura en lotes de ``batch_size``."""
+        batch_size = max(self.batch_size or 0, 1)
+        return [vals_list[start:start + batch_size] for start in range(0, len(vals_list), batch_size)]
+
+    def _flush_move_batch(self, vals_list):
+        """Crea y (opcionalmente) publica un lote de facturas.
+
+        Con ``check_move_validity=False`` la sincronización de líneas dinámicas
+        (impuestos, términos de pago) y el cuadre se hacen una sola vez para
+        todo el lote; el cuadre se vuelve a verificar al publicar.
+        """
+        profiler = self._get_import_profiler()
+        label = "%s invoice(s) from ref %s" % (len(vals_list), vals_list[0].get('ref') or '-')
+        with profiler.phase('create', label="create " + label):
+            vals_list = self._filter_imported(vals_list)
+            if not vals_list:
+                return self.env['account.move']
+            moves = self.env['account.move'].sudo().with_context(
+                check_move_validity=False,
+            ).create(vals_list)
+            self.env.flush_all()
+        if self.invoice_stage_option == 'validate':
+            with profiler.phase('post', label="post " + label):
+                moves.with_context(check_move_validity=True).action_post()
+        profiler.invoice_count += len(moves)
+        return moves
+
+    def _filter_imported(self, vals_list):
+        """Omite las facturas cuya huella ya existe (una consulta por lote)."""
+        fingerprints = [vals['import_fingerprint'] for vals in vals_list if vals.get('import_fingerprint')]
+        if not fingerprints:
+            return vals_list
+        existing = self.env['account.move'].sudo().search_read(
+            [('import_fingerprint', 'in', fingerprints)], ['import_fingerprint'])
+        existing = {rec['import_fingerprint'] for rec in existing}
+        if not existing:
+            return vals_list
+        return [vals for vals in vals_list if vals.get('import_fingerprint') not in existing]
+
+    # ------------------------------------------------------------
+    # PRE-RESOLUCIÓN DE REFERENCIAS (UNA CONSULTA POR MODELO)
+    # ------------------------------------------------------------
+    def _prepare_lookups(self, data_rows, errors=None):
+        """Reúne los valores distintos de cada columna de referencia y los
+        resuelve con una consulta ``in`` por modelo.
+
+        :param errors: si se indica, los mensajes de error se agregan a esta
+            lista en lugar de lanzar la excepción.
+        :return: dict {'partner'|'product'|'currency'|'journal'|'account'|'tax':
+            {valor_excel: record}}
+        :raises ValidationError: con todos los valores no resueltos a la vez.
+        """
+        keys = {name: set() for name in ('partner', 'product', 'currency', 'journal', 'account', 'tax')}
+        product_accounts = set()
+        raise_errors = errors is None
+        errors = [] if errors is None else errors
+
+        for row, data in data_rows:
+            if not data['partner_vat_or_name']:
+                errors.append(_("Partner is empty at row %s") % (row + 1))
+            if not data['product_code']:
+                errors.append(_("Product code or name is missing at row %s") % (row + 1))
+            keys['partner'].add(data['partner_vat_or_name'])
+            keys['product'].add(data['product_code'])
+            keys['currency'].add(data['currency'])
+            keys['journal'].add(data['journal_code'])
+            keys['tax'].update(self._split_tax_names(data['taxes']))
+            if self._use_excel_account(data):
+                keys['account'].add(data['account_code'])
+            else:
+                product_accounts.add((data['product_code'], self._is_sale_type(data['invoice_type'])))
+
+        for name in ('partner', 'product'):
+            keys[name].discard('')
+
+        with self._get_import_profiler().phase('resolve'):
+            lookups = {
+                'partner': self._resolve_partners(keys['partner']),
+                'product': self._resolve_products(keys['product']),
+                'currency': self._resolve_currencies(keys['currency']),
+                'journal': self._resolve_journals(keys['journal']),
+                'account': self._resolve_accounts(keys['account']),
+                'tax': self._resolve_taxes(keys['tax']),
+            }
+
+        for name in ('partner', 'product', 'currency', 'journal', 'account'):
+            missing = keys[name] - set(lookups[name])
+            errors += [self._get_lookup_error(name, value) for value in sorted(missing)]
+
+        for code, is_sale in sorted(product_accounts):
+            product = lookups['product'].get(code)
+            if product and not self._get_product_account(product, is_sale):
+                errors.append(_('No valid account for product "%s"') % product.name)
+
+        if errors and raise_errors:
+            raise ValidationError("\n".join(errors))
+        return lookups
+
     # ------------------------------------------------------------
     # VALIDACIÓN Y LECTURA DE DATOS
     # ------------------------------------------------------------
-    def _validate_headers(self, sheet):
-        """Valida que todas las columnas esperadas existan en el Excel."""
-        headers = [str(sheet.cell(0, c).value).strip() for c in range(sheet.ncols)]
-        missing = [h for h in EXPECTED_HEADERS if h not in headers]
+    def _get_lookup_error(self, name, value):
+        """Mensaje de error para un valor de referencia no resuelto."""
+        if name == 'partner':
+            return _("Partner not found: %s") % value if value else _("Partner is empty")
+        if name == 'product':
+            if not value:
+                return _("Product code or name is missing.")
+            return _("Product not found for %s: %s") % (self._get_product_search_label(), value)
+        if name == 'currency':
+            return _("Invalid currency: %s") % value
+        if name == 'journal':
+            return _("Invalid journal code: %s") % value
+        return _('Invalid account code "%s"') % value
+
+    def _lookup(self, lookups, name, value):
+        """Obtiene un registro pre-resuelto o lanza el error correspondiente."""
+        record = lookups[name].get(value)
+        if not record:
+            raise ValidationError(self._get_lookup_error(name, value))
+        return record
+
+    def _validate_headers(self, header_row):
+        """Valida que todas las columnas esperadas existan en el Excel.
+
+        :return: mapa {encabezado: índice de columna}, según la posición real
+            de cada encabezado en el archivo (el orden de columnas es libre).
+        """
+        header_map = {}
+        for idx, header in enumerate(header_row):
+            if header is not None:
+                header_map.setdefault(str(header).strip(), idx)
+        missing = [h for h in EXPECTED_HEADERS if h not in header_map]
         if missing:
             raise ValidationError(_("Missing columns in Excel: %s") % ", ".join(missing))
+        return header_map
 
-    def _read_row(self, sheet, row):
-        """Lee una fila del Excel y la transforma en un diccionario.
+    def _prepare_column_readers(self, rows):
+        """Consume y valida la fila de encabezados y calcula, una sola vez por
+        hoja, el lector de cada columna: (nombre, índice, conversor).
 
         ✅ Controla el tipo de interpretación por columna:
-           - excel_invoice, partner_vat_or_name, quantity → número sin decimales
+           - excel_invoice, partner_vat_or_name, quantity, account_code → número sin decimales
            - unit_price, discount → número con decimales
+           - invoice_date, invoice_date_due, accounting_date → fecha nativa o texto
            - resto → texto (string)
-        """
-        cols = {name: idx for idx, name in enumerate(EXPECTED_HEADERS)}
-
-        # Definición de columnas numéricas
-        no_decimal_fields = ['excel_invoice', 'partner_vat_or_name', 'quantity', 'account_code']
-        decimal_fields = ['unit_price', 'discount']
-
-        def val(name):
-            value = sheet.cell(row, cols[name]).value
-
-            # Campo vacío
-            if value in (None, ''):
-                return ''
-
-            # 🧮 Campos numéricos sin decimales
-            if name in no_decimal_fields:
-                if isinstance(value, float):
-                    return str(int(value))  # Quita ".0"
-                return str(value).strip()
 
-            # 💲 Campos numéricos con decimales
-            if name in decimal_fields:
-                try:
-                    return str(round(float(value), 6))  # Hasta 6 decimales para precios
-                except Exception:
-                    return '0'
-
-            # 🔤 Resto: texto plano
-            return str(value).strip()
+        :return: (fila de encabezados, lectores)
+        """
+        header_row = self._read_headers(rows)
+        header_map = self._validate_headers(header_row)
+        readers = tuple(
+            (name, header_map[name], COLUMN_CONVERTERS.get(name, _to_text))
+            for name in EXPECTED_HEADERS
+        )
+        return header_row, readers
 
-        return {name: val(name) for name in EXPECTED_HEADERS}
+    def _read_row(self, values, readers):
+        """Lee una fila del Excel y la transforma en un diccionario, usando los
+        lectores de ``_prepare_column_readers`` (solo indexación por fila)."""
+        try:
+            return {name: convert(values[idx]) for name, idx, convert in readers}
+        except IndexError:
+            # Fila más corta que los encabezados (celdas finales vacías)
+            return {name: convert(values[idx]) if idx < len(values) else ''
+                    for name, idx, convert in readers}
 
     def _validate_row(self, data, row):
         """Valida los datos mínimos requeridos."""
@@ -237,110 +959,183 @@ class ImportInvoiceWizard(models.TransientModel):
         if data['tipo_gasto'] not in ["mixto", "compra", "servicio", "importacion", "combustible"]:
             raise ValidationError(_("Invalid tipo_gasto at row %s") % (row + 1))
 
+    def _parse_row_dates(self, data, row):
+        """Fechas de la fila: (emisión, vencimiento, contable)."""
+        invoice_date = self._parse_date(data['invoice_date'], row, "invoice_date")
+        due_date = self._parse_date(data['invoice_date_due'], row, "invoice_date_due") if data[
+            'invoice_date_due'] else None
+        accounting_date = self._parse_date(data['accounting_date'] or data['invoice_date'], row, "accounting_date")
+        return invoice_date, due_date, accounting_date
+
     def _parse_date(self, value, row, field):
-        """Convierte texto a fecha en formato Odoo (YYYY-MM-DD)."""
+        """Convierte la fecha (nativa de Excel o texto) a formato Odoo (YYYY-MM-DD)."""
         if not value:
             return False
+        if isinstance(value, date):
+            return value.strftime(DEFAULT_SERVER_DATE_FORMAT)
         value = str(value).strip()
-        for fmt in ('%d-%m-%Y', '%Y-%m-%d', '%d/%m/%Y'):
-            try:
-                return datetime.strptime(value, fmt).strftime(DEFAULT_SERVER_DATE_FORMAT)
-            except Exception:
-                continue
+        parsed = _parse_date_text(value)
+        if parsed:
+            return parsed
         raise ValidationError(_("Invalid date '%s' for %s at row %s (expected dd-mm-YYYY)") % (value, field, row))
 
     # ------------------------------------------------------------
-    # RESOLVERS DE MODELOS
+    # RESOLVERS DE MODELOS (EN BLOQUE)
     # ------------------------------------------------------------
-    def _resolve_partner(self, partner_value, partner_obj):
-        """Busca el partner por NIT o nombre."""
-        if not partner_value:
-            raise ValidationError(_("Partner is empty"))
-        partner = partner_obj.search([('vat', '=', partner_value)], limit=1)
-        if not partner:
-            partner = partner_obj.search([('name', '=', partner_value)], limit=1)
-        if not partner:
-            raise ValidationError(_("Partner not found: %s") % partner_value)
-        return partner
-
-    def _resolve_product(self, code, product_obj):
-        """Obtiene el producto según la opción seleccionada en el wizard:
-        - Si import_product_by = 'code' → busca en default_code.
-        - Si import_product_by = 'name' → busca en name.
-        - Si import_product_by = 'barcode' → busca en barcode.
+    def _map_first(self, records, field_name, mapping=None):
+        """Mapea valor → primer registro encontrado (equivale a limit=1)."""
+        mapping = {} if mapping is None else mapping
+        for record in records:
+            mapping.setdefault(record[field_name], record)
+        return mapping
+
+    def _get_lookup_cache_scope(self, *extra):
+        """Clave de la caché de referencias: compañías activas (reglas de
+        registro) y, si aplica, el campo de búsqueda."""
+        return (tuple(self.env.companies.ids),) + extra
+
+    def _get_cached_lookups(self, kind, model, scope, values):
+        """Registros ya resueltos en importaciones anteriores (caché del
+        proceso, invalidada por res.partner / product.product).
+
+        :return: (generación de la caché, {valor: registro}); la generación
+            se pasa a ``lookup_cache.set_many`` al guardar lo resuelto.
         """
-        if not code:
-            raise ValidationError(_("Product code or name is missing."))
-
-        search_domain = []
-        search_label = ""
-
-        if self.import_product_by == 'code':
-            search_domain = [('default_code', '=', code)]
-            search_label = _("internal code")
-        elif self.import_product_by == 'name':
-            search_domain = [('name', '=', code)]
-            search_label = _("name")
-        elif self.import_product_by == 'barcode':
-            search_domain = [('barcode', '=', code)]
-            search_label = _("barcode")
-        else:
+        current = lookup_cache.generation(self.env.cr, kind)
+        cached = lookup_cache.get_many(self.env.registry, kind, current, scope, values)
+        return current, {value: self.env[model].browse(record_id) for value, record_id in cached.items()}
+
+    def _resolve_partners(self, values):
+        """Busca los partners por NIT y, los restantes, por nombre (primero en
+        la caché de referencias)."""
+        if not values:
+            return {}
+        partner_obj = self.env['res.partner']
+        scope = self._get_lookup_cache_scope()
+        current, partners = self._get_cached_lookups('partner', 'res.partner', scope, values)
+        pending = [v for v in values if v not in partners]
+        if not pending:
+            return partners
+        found = self._map_first(partner_obj.search([('vat', 'in', pending)]), 'vat')
+        pending = [v for v in pending if v not in found]
+        if pending:
+            by_name = self._map_first(partner_obj.search([('name', 'in', pending)]), 'name')
+            found.update({v: by_name[v] for v in pending if v in by_name})
+        lookup_cache.set_many(self.env.registry, 'partner', current, scope,
+                              {value: partner.id for value, partner in found.items()})
+        partners.update(found)
+        return partners
+
+    def _get_product_search_field(self):
+        """Campo de búsqueda del producto según la opción del wizard:
+        - Si import_product_by = 'code' → default_code.
+        - Si import_product_by = 'name' → name.
+        - Si import_product_by = 'barcode' → barcode.
+        """
+        field_name = {
+            'code': 'default_code',
+            'name': 'name',
+            'barcode': 'barcode',
+        }.get(self.import_product_by)
+        if not field_name:
             raise ValidationError(_("Invalid product identification method."))
+        return field_name
+
+    def _get_product_search_label(self):
+        return {
+            'code': _("internal code"),
+            'name': _("name"),
+            'barcode': _("barcode"),
+        }.get(self.import_product_by, '')
+
+    def _resolve_products(self, values):
+        """Obtiene los productos según la opción seleccionada en el wizard
+        (primero en la caché de referencias)."""
+        if not values:
+            return {}
+        field_name = self._get_product_search_field()
+        scope = self._get_lookup_cache_scope(field_name)
+        current, products = self._get_cached_lookups('product', 'product.product', scope, values)
+        pending = [v for v in values if v not in products]
+        if not pending:
+            return products
+        found = self._map_first(self.env['product.product'].search([(field_name, 'in', pending)]), field_name)
+        lookup_cache.set_many(self.env.registry, 'product', current, scope,
+                              {value: product.id for value, product in found.items()})
+        products.update(found)
+        return products
 
-        product = product_obj.search(search_domain, limit=1)
-        if not product:
-            raise ValidationError(_("Product not found for %s: %s") % (search_label, code))
-        return product
+    def _resolve_currencies(self, values):
+        """Obtiene las monedas por su código (GTQ, USD, ...)."""
+        if not values:
+            return {}
+        currencies = self.env['res.currency'].search([('name', 'in', list(values))])
+        return self._map_first(currencies, 'name')
 
-    def _resolve_journal(self, code):
-        """Valida y obtiene el diario contable."""
-        journal = self.env['account.journal'].search([
-            ('code', '=', code),
+    def _resolve_journals(self, values):
+        """Valida y obtiene los diarios contables de la compañía."""
+        if not values:
+            return {}
+        journals = self.env['account.journal'].search([
+            ('code', 'in', list(values)),
             ('company_id', '=', self.company_id.id)
-        ], limit=1)
-        if not journal:
-            raise ValidationError(_("Invalid journal code: %s") % code)
-        return journal
-
-    def _resolve_taxes(self, tax_str, tax_obj):
-        """Convierte los nombres de impuestos en IDs."""
-        tax_list = []
-        if tax_str:
-            names = [t.strip() for t in tax_str.split(',') if t.strip()]
-            for tx in names:
-                tax_id = tax_obj.search([
-                    ('name', '=', tx),
-                    ('company_id', '=', self.company_id.id)
-                ], limit=1)
-                if tax_id:
-                    tax_list.append(tax_id.id)
-        return tax_list
-
-    def _resolve_account(self, data, product_account, product):
-        """Determina la cuenta contable según la configuración del asistente."""
-        if self.account_option == 'from_excel_account' and data.get('account_code'):
-            acc = product_account.search([
-                ('code', '=', data['account_code']),
-                ('company_id', '=', self.company_id.id)
-            ], limit=1)
-            if not acc:
-                raise ValidationError(_('Invalid account code "%s"') % data['account_code'])
-            return acc
-        else:
-            move_type = self._get_move_type(data['invoice_type'])
+        ])
+        return self._map_first(journals, 'code')
 
-            # ✅ CAMBIO: Ampliada la lógica de cuentas.
-            # Tipos de cliente (out) usan cuentas de Ingreso.
-            # Tipos de proveedor (in) usan cuentas de Gasto.
-            if move_type in ['out_invoice', 'out_refund', 'out_receipt']:
-                acc = product.property_account_income_id or product.categ_id.property_account_income_categ_id
-            else:
-                # in_invoice, in_refund, in_receipt
-                acc = product.property_account_expense_id or product.categ_id.property_account_expense_categ_id
+    def _resolve_accounts(self, values):
+        """Obtiene las cuentas contables de la compañía por código."""
+        if not values:
+            return {}
+        accounts = self.env['account.account'].search([
+            ('code', 'in', list(values)),
+            ('company_id', '=', self.company_id.id)
+        ])
+        return self._map_first(accounts, 'code')
+
+    def _resolve_taxes(self, values):
+        """Obtiene los impuestos de la compañía por nombre."""
+        if not values:
+            return {}
+        taxes = self.env['account.tax'].search([
+            ('name', 'in', list(values)),
+            ('company_id', '=', self.company_id.id)
+        ])
+        return self._map_first(taxes, 'name')
+
+    def _split_tax_names(self, tax_str):
+        """Separa la columna de impuestos (nombres separados por coma)."""
+        if not tax_str:
+            return []
+        return [t.strip() for t in tax_str.split(',') if t.strip()]
+
+    def _get_tax_ids(self, tax_str, lookups):
+        """Convierte los nombres de impuestos en IDs (los no encontrados se omiten)."""
+        taxes = lookups['tax']
+        return [taxes[name].id for name in self._split_tax_names(tax_str) if name in taxes]
 
-            if not acc:
-                raise ValidationError(_('No valid account for product "%s"') % product.name)
-            return acc
+    def _use_excel_account(self, data):
+        return self.account_option == 'from_excel_account' and bool(data.get('account_code'))
+
+    def _is_sale_type(self, invoice_type):
+        # ✅ CAMBIO: Ampliada la lógica de cuentas.
+        # Tipos de cliente (out) usan cuentas de Ingreso.
+        # Tipos de proveedor (in) usan cuentas de Gasto.
+        return self._get_move_type(invoice_type) in ['out_invoice', 'out_refund', 'out_receipt']
+
+    def _get_product_account(self, product, is_sale):
+        if is_sale:
+            return product.property_account_income_id or product.categ_id.property_account_income_categ_id
+        # in_invoice, in_refund, in_receipt
+        return product.property_account_expense_id or product.categ_id.property_account_expense_categ_id
+
+    def _resolve_account(self, data, lookups, product):
+        """Determina la cuenta contable según la configuración del asistente."""
+        if self._use_excel_account(data):
+            return self._lookup(lookups, 'account', data['account_code'])
+        acc = self._get_product_account(product, self._is_sale_type(data['invoice_type']))
+        if not acc:
+            raise ValidationError(_('No valid account for product "%s"') % product.name)
+        return acc
 
     # ------------------------------------------------------------
     # BUILDERS
@@ -367,16 +1162,38 @@ class ImportInvoiceWizard(models.TransientModel):
         }
         if due_date:
             vals['invoice_date_due'] = due_date
+        if self.env.context.get('import_file_hash'):
+            vals['import_fingerprint'] = self._get_import_fingerprint(data, partner)
         return vals
 
+    def _get_import_fingerprint(self, data, partner):
+        """Huella de la factura: hash del archivo + excel_invoice + partner + ref."""
+        key = '|'.join([
+            self.env.context['import_file_hash'],
+            data['excel_invoice'],
+            str(partner.id),
+            data['ref_invoice'] or '',
+        ])
+        return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
     def _prepare_line_vals(self, data, product, taxes, account):
-        """Construye las líneas de factura."""
+        """Construye las líneas de factura.
+
+        :raises ValidationError: si la cantidad, el precio o el descuento no
+            son numéricos (en modo 'skip' se rechaza solo esa factura).
+        """
+        try:
+            quantity = float(data['quantity'] or 0)
+            discount = float(data['discount'] or 0)
+            price_unit = float(data['unit_price'] or 0)
+        except ValueError:
+            raise ValidationError(_("Invalid quantity, unit price or discount for invoice %s") % data['excel_invoice'])
         return {
             'name': data['description'],
             'product_id': product.id,
-            'quantity': float(data['quantity'] or 0),
-            'discount': float(data['discount'] or 0),
-            'price_unit': float(data['unit_price'] or 0),
+            'quantity': quantity,
+            'discount': discount,
+            'price_unit': price_unit,
             'tax_ids': [(6, 0, taxes)],
             'account_id': account.id,
         }
@@ -393,17 +1210,180 @@ class ImportInvoiceWizard(models.TransientModel):
         """
         return invoice_type_excel
 
+    def _get_error_message(self, error):
+        """Texto legible de una excepción (ValidationError, UserError, SQL...)."""
+        return str(error.args[0]) if error.args else str(error)
+
+    def _build_error_workbook(self, content, errors):
+        """Genera, en una sola pasada sobre el archivo, un Excel con las filas
+        de las facturas rechazadas y una columna adicional con el error."""
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet(_("Rejected Rows"))
+        rows = self._iter_file_rows(content)
+        header_row, readers = self._prepare_column_readers(rows)
+        ws.append(list(header_row) + ['error'])
+        for values in rows:
+            key = self._read_row(values, readers)['excel_invoice']
+            if key in errors:
+                ws.append(list(values) + [errors[key]])
+
+        file_data = BytesIO()
+        wb.save(file_data)
+        return file_data.getvalue()
+
     def _open_created_invoices(self, created_moves):
         """Retorna acción para abrir las facturas creadas."""
         action = self.env["ir.actions.actions"]._for_xml_id("account.action_move_in_invoice_type")
         action['domain'] = [('id', 'in', created_moves.ids)]
         return action
 
+    # ------------------------------------------------------------
+    # EXPORTAR FACTURAS AL FORMATO DE LA PLANTILLA
+    # ------------------------------------------------------------
+    def _export_moves(self, output):
+        """Escribe ``export_move_ids`` y sus líneas en ``output`` (ruta .xlsx)
+        con las columnas de EXPECTED_HEADERS, listo para volver a importarse.
+
+        xlsxwriter en modo ``constant_memory`` escribe fila por fila a disco;
+        las facturas se leen en lotes de ``EXPORT_BATCH_SIZE`` con ``read`` /
+        ``search_read`` y las referencias (partner, producto, cuentas...) se
+        resuelven en bloque con una caché de nombres por modelo.
+        """
+        self.ensure_one()
+        move_obj = self.env['account.move']
+        move_fields = [name for name in (
+            'name', 'partner_id', 'invoice_date', 'invoice_date_due', 'narration', 'ref',
+            'tipo_gasto', 'currency_id', 'firma_fel', 'serie_fel', 'numero_fel',
+            'journal_id', 'move_type', 'payment_reference', 'date',
+        ) if name in move_obj._fields]
+        line_fields = ['move_id', 'product_id', 'name', 'quantity', 'price_unit', 'discount',
+                       'tax_ids', 'analytic_distribution', 'account_id']
+
+        workbook = xlsxwriter.Workbook(output, {'constant_memory': True})
+        sheet = workbook.add_worksheet(_("Invoices"))
+        sheet.write_row(0, 0, EXPECTED_HEADERS)
+        row = 1
+        names = {}
+        move_ids = self.export_move_ids.ids
+        for start in range(0, len(move_ids), EXPORT_BATCH_SIZE):
+            batch = move_obj.browse(move_ids[start:start + EXPORT_BATCH_SIZE])
+            moves = {move['id']: move for move in batch.read(move_fields, load=False)}
+            lines = self.env['account.move.line'].search_read(
+                [('move_id', 'in', batch.ids), ('display_type', '=', 'product')],
+                line_fields, order='move_id, sequence, id', load=False)
+            self._load_export_names(names, moves.values(), lines)
+
+            previous_move_id = None
+            for line in lines:
+                move = moves[line['move_id']]
+                first = line['move_id'] != previous_move_id
+                previous_move_id = line['move_id']
+                sheet.write_row(row, 0, self._get_export_row(move, line, names, first))
+                row += 1
+            self.env.invalidate_all()
+        workbook.close()
+
+    def _load_export_names(self, names, moves, lines):
+        """Completa ``names`` {modelo: {id: valor}} leyendo en bloque solo los
+        ids que aún no se conocen."""
+        def collect(records, field_name):
+            ids = set()
+            for record in records:
+                value = record.get(field_name)
+                if isinstance(value, list):
+                    ids.update(value)
+                elif value:
+                    ids.add(value)
+            return ids
+
+        analytic_ids = set()
+        for line in lines:
+            analytic_ids.update(int(key) for key in (line['analytic_distribution'] or {}))
+
+        references = [
+            ('res.partner', collect(moves, 'partner_id'), ['vat', 'name']),
+            ('account.journal', collect(moves, 'journal_id'), ['code']),
+            ('res.currency', collect(moves, 'currency_id'), ['name']),
+            ('product.product', collect(lines, 'product_id'), [self._get_product_search_field()]),
+            ('account.account', collect(lines, 'account_id'), ['code']),
+            ('account.tax', collect(lines, 'tax_ids'), ['name']),
+            ('account.analytic.account', analytic_ids, ['name']),
+        ]
+        for model, ids, field_names in references:
+            cache = names.setdefault(model, {})
+            missing = [record_id for record_id in ids if record_id not in cache]
+            if not missing:
+                continue
+            records = self.env[model].with_context(active_test=False).browse(missing)
+            for record in records.read(field_names, load=False):
+                cache[record['id']] = next((str(record[f]) for f in field_names if record[f]), '')
+
+    def _get_export_row(self, move, line, names, first_line):
+        """Fila del Excel (orden de EXPECTED_HEADERS) para una línea de factura.
+        El comentario (narration) solo se escribe en la primera línea, ya que
+        la importación concatena los comentarios de todas las líneas."""
+        def name_of(model, record_id):
+            return names[model].get(record_id, '') if record_id else ''
+
+        def date_of(value):
+            return value.strftime(EXPORT_DATE_FORMAT) if value else ''
+
+        analytic = ', '.join(
+            '%s:%s' % (name_of('account.analytic.account', int(key)), '{:g}'.format(percent))
+            for key, percent in (line['analytic_distribution'] or {}).items()
+        )
+        values = {
+            'excel_invoice': move['name'] if move['name'] and move['name'] != '/' else 'ID%s' % move['id'],
+            'partner_vat_or_name': name_of('res.partner', move['partner_id']),
+            'invoice_date': date_of(move['invoice_date']),
+            'invoice_date_due': date_of(move['invoice_date_due']),
+            'product_code': name_of('product.product', line['product_id']),
+            'description': line['name'] or '',
+            'quantity': line['quantity'],
+            'unit_price': line['price_unit'],
+            'discount': line['discount'],
+            'taxes': ','.join(name_of('account.tax', tax_id) for tax_id in line['tax_ids']),
+            'analytic_distribution': analytic,
+            'comment': html2plaintext(move['narration']) if first_line and move['narration'] else '',
+            'ref_invoice': move['ref'] or '',
+            'tipo_gasto': move.get('tipo_gasto') or '',
+            'currency': name_of('res.currency', move['currency_id']),
+            'firma_fel': move.get('firma_fel') or '',
+            'serie_fel': move.get('serie_fel') or '',
+            'numero_fel': move.get('numero_fel') or '',
+            'journal_code': name_of('account.journal', move['journal_id']),
+            'account_code': name_of('account.account', line['account_id']),
+            'invoice_type': move['move_type'],
+            'payment_ref': move['payment_reference'] or '',
+            'accounting_date': date_of(move['date']),
+        }
+        return [values[header] for header in EXPECTED_HEADERS]
+
     # ------------------------------------------------------------
     # DESCARGAR PLANTILLA DE EJEMPLO
     # ------------------------------------------------------------
     def download_template(self):
-        """Genera y permite descargar una plantilla Excel de ejemplo.
+        """Descarga la plantilla Excel de ejemplo (servida por el controlador,
+        sin crear adjuntos)."""
+        return {
+            'type': 'ir.actions.act_url',
+            'url': '/odoo_import_invoice/download_template',
+            'target': 'self',
+        }
+
+    @api.model
+    def _get_template_content(self):
+        """Contenido (bytes) de la plantilla en el idioma del usuario, cacheado
+        en memoria por idioma y versión del módulo."""
+        module = __name__.split('.')[2]
+        key = (self.env.lang or 'en_US', get_manifest(module).get('version'))
+        if key not in _TEMPLATE_CACHE:
+            _TEMPLATE_CACHE[key] = self._render_template()
+        return _TEMPLATE_CACHE[key]
+
+    @api.model
+    def _render_template(self):
+        """Genera la plantilla Excel de ejemplo.
         ✳️ Incluye soporte para traducción dinámica de filas de ayuda y ejemplo.
         ✅ Parche aplicado para eliminar advertencias de reparación en Excel.
         """
@@ -472,26 +1452,7 @@ class ImportInvoiceWizard(models.TransientModel):
         wb.properties.created = datetime.now()
         wb.properties.modified = datetime.now()
 
-        # Guardar en memoria y codificar
+        # Guardar en memoria
         file_data = BytesIO()
         wb.save(file_data)
-        file_data.seek(0)
-        file_content = base64.b64encode(file_data.read())
-        file_data.close()
-
-        # Crear adjunto temporal
-        attachment = self.env['ir.attachment'].create({
-            'name': 'invoice_import_template.xlsx',
-            'type': 'binary',
-            'datas': file_content,
-            'mimetype': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-            'res_model': self._name,
-            'res_id': self.id,
-        })
-
-        # Retornar acción de descarga directa
-        return {
-            'type': 'ir.actions.act_url',
-            'url': '/web/content/%s?download=true' % attachment.id,
-            'target': 'self',
-        }
\ No newline at end of file
+        return file_data.getvalue()
@@ -1,7 +1,7 @@
 # -*- coding: utf-8 -*-
 {
     'name': 'Localización Fiscal Hondureña',
-    'version': '16.0.10.0',
+    'version': '16.0.12.0',
     'category': 'Account',
     'summary': 'Factura DPS, Libros fiscales, CAI y reportes PT (Odoo 16 & 17) para el SAR',
     'author': 'Allan Ramirez / INTEGRALL',
@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+"""
+Prueba de carga de la publicación concurrente de facturas en un diario con CAI.
+
+N trabajadores (hilos, cada uno con su propio cursor) crean y publican
+facturas de venta en el mismo diario durante ``duration`` segundos, con un
+commit por factura, como varias cajas publicando a la vez. Reporta
+publicaciones/s, latencia (p50/p95/máx.), conflictos de concurrencia
+reintentados y si los correlativos asignados quedaron sin huecos ni fuera
+del rango del CAI. Cada resultado se agrega a un archivo JSON Lines.
+
+USO:
+    Desde el shell de Odoo:
+        $ odoo-bin shell -c odoo.conf -d load_db
+        >>> from odoo.addons.l10n_hn_fiscal.benchmarks import cai_posting_load
+        >>> cai_posting_load.run_load_test(env, 'INV', workers=40, duration=60)
+
+    Como script:
+        $ python3 cai_posting_load.py -c odoo.conf -d load_db --journal INV \\
+              --workers 40 --duration 60
+
+Las facturas publicadas quedan en la base de datos (cada publicación hace
+commit). No ejecutar contra una base de datos de producción.
+"""
+
+import argparse
+import json
+import threading
+import time
+
+DEFAULT_OUTPUT = 'cai_posting_load.jsonl'
+MAX_RETRIES = 5
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100.0))]
+
+
+def _is_concurrency_error(error):
+    from odoo.service.model import PG_CONCURRENCY_ERRORS_TO_RETRY
+    return getattr(error, 'pgcode', None) in PG_CONCURRENCY_ERRORS_TO_RETRY
+
+
+def _post_one(env, journal_id, partner_id):
+    """Crea y publica una factura de venta; retorna su id."""
+    move = env['account.move'].create({
+        'move_type': 'out_invoice',
+        'journal_id': journal_id,
+        'partner_id': partner_id,
+        'invoice_line_ids': [(0, 0, {'name': 'Load test', 'quantity': 1, 'price_unit': 100.0})],
+    })
+    move.action_post()
+    return move.id
+
+
+def _worker(registry, uid, journal_id, partner_id, deadline, stats, lock):
+    from odoo import api
+
+    latencies = []
+    posted = retries = failures = 0
+    with registry.cursor() as cr:
+        env = api.Environment(cr, uid, {})
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            for attempt in range(MAX_RETRIES + 1):
+                try:
+                    _post_one(env, journal_id, partner_id)
+                    cr.commit()
+                    posted += 1
+                    latencies.append(time.perf_counter() - start)
+                    break
+                except Exception as e:
+                    cr.rollback()
+                    env.invalidate_all()
+                    if _is_concurrency_error(e) and attempt < MAX_RETRIES:
+                        retries += 1
+                        continue
+                    failures += 1
+                    break
+    with lock:
+        stats['latencies'].extend(latencies)
+        stats['posted'] += posted
+        stats['retries'] += retries
+        stats['failures'] += failures
+
+
+def _check_numbers(env, journal, since_id):
+    """Huecos, duplicados y números fuera de rango de lo publicado en la prueba."""
+    env.invalidate_all()
+    moves = env['account.move'].search([
+        ('journal_id', '=', journal.id),
+        ('state', '=', 'posted'),
+        ('id', '>', since_id),
+    ])
+    numbers = sorted(moves.mapped('l10n_hn_correlativo'))
+    sequence = journal.sequence_id
+    step = sequence.number_increment or 1
+    gaps = sum(1 for a, b in zip(numbers, numbers[1:]) if b - a != step)
+    out_of_range = sum(1 for n in numbers if sequence.range_end and n > sequence.range_end)
+    return {
+        'numbers': len(numbers),
+        'first': numbers[0] if numbers else None,
+        'last': numbers[-1] if numbers else None,
+        'gaps': gaps,
+        'duplicates': len(numbers) - len(set(numbers)),
+        'out_of_range': out_of_range,
+    }
+
+
+def run_load_test(env, journal_code, workers=10, duration=30,
+                  output=DEFAULT_OUTPUT, label=None):
+    """Ejecuta un escenario y retorna (y guarda) el resultado como dict."""
+    from odoo.modules.module import get_manifest
+
+    journal = env['account.journal'].search([
+        ('code', '=', journal_code), ('company_id', '=', env.company.id)], limit=1)
+    if not journal or not journal.sequence_id.active_sar:
+        raise ValueError("Journal %s needs a CAI-controlled (fiscal) sequence." % journal_code)
+    sequence = journal.sequence_id
+    partner = env['res.partner'].search([('name', '=', 'Load Test Customer')], limit=1) \
+        or env['res.partner'].create({'name': 'Load Test Customer'})
+    since_id = env['account.move'].search([], order='id desc', limit=1).id or 0
+    env.cr.commit()
+
+    stats = {'latencies': [], 'posted': 0, 'retries': 0, 'failures': 0}
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+    start = time.perf_counter()
+    threads = [
+        threading.Thread(target=_worker, args=(env.registry, env.uid, journal.id, partner.id,
+                                               deadline, stats, lock))
+        for _i in range(workers)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    latencies = stats['latencies']
+    result = {
+        'label': label,
+        'module_version': get_manifest('l10n_hn_fiscal').get('version'),
+        'date': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'shape': {'workers': workers, 'duration': duration,
+                  'implementation': sequence.implementation},
+        'elapsed': round(elapsed, 3),
+        'posted': stats['posted'],
+        'posts_per_second': round(stats['posted'] / elapsed, 1) if elapsed else 0.0,
+        'retries': stats['retries'],
+        'failures': stats['failures'],
+        'latency_p50': round(_percentile(latencies, 50), 4),
+        'latency_p95': round(_percentile(latencies, 95), 4),
+        'latency_max': round(max(latencies), 4) if latencies else 0.0,
+        'numbers': _check_numbers(env, journal, since_id),
+    }
+
+    if output:
+        with open(output, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(result) + '\n')
+    print_result(result)
+    return result
+
+
+def print_result(result):
+    shape = result['shape']
+    numbers = result['numbers']
+    print("CAI posting load test — version %s" % result['module_version'])
+    print("  %s workers, %ss (%s)"
+          % (shape['workers'], shape['duration'], shape['implementation']))
+    print("  %s posts in %.2fs → %.1f posts/s   retries: %s   failures: %s"
+          % (result['posted'], result['elapsed'], result['posts_per_second'],
+             result['retries'], result['failures']))
+    print("  latency p50 %.3fs  p95 %.3fs  max %.3fs"
+          % (result['latency_p50'], result['latency_p95'], result['latency_max']))
+    print("  numbers %s..%s: %s gaps, %s duplicates, %s out of range"
+          % (numbers['first'], numbers['last'], numbers['gaps'],
+             numbers['duplicates'], numbers['out_of_range']))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CAI posting load test")
+    parser.add_argument('-c', '--config', required=True, help="Odoo configuration file")
+    parser.add_argument('-d', '--database', required=True, help="Local test database")
+    parser.add_argument('--journal', required=True, help="Code of the CAI-controlled sale journal")
+    parser.add_argument('--workers', type=int, default=10)
+    parser.add_argument('--duration', type=int, default=30, help="Seconds")
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help="JSON Lines results file")
+    parser.add_argument('--label', help="Free text stored with the result")
+    args = parser.parse_args()
+
+    import odoo
+    from odoo import api, SUPERUSER_ID
+
+    odoo.tools.config.parse_config(['-c', args.config, '-d', args.database])
+    registry = odoo.registry(args.database)
+    with registry.cursor() as cr:
+        env = api.Environment(cr, SUPERUSER_ID, {})
+        run_load_test(
+            env,
+            args.journal,
+            workers=args.workers,
+            duration=args.duration,
+            output=args.output,
+            label=args.label,
+        )
+
+
+if __name__ == '__main__':
+    main()
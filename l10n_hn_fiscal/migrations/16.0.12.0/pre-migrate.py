@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+"""
+Crea y rellena la columna account_move.l10n_hn_correlativo con SQL antes de
+actualizar el módulo, para que el ORM no la calcule factura por factura.
+Los índices (CAI / diario + correlativo) se crean en AccountMove.init().
+
+Los contadores de uso de l10n_hn.cai vuelven a calcularse desde esos índices
+(sin almacenar): se eliminan las columnas que guardaba la versión 16.0.11.0.
+"""
+
+
+def migrate(cr, version):
+    if not version:
+        return
+    cr.execute("ALTER TABLE account_move ADD COLUMN IF NOT EXISTS l10n_hn_correlativo integer")
+    cr.execute(r"""
+        UPDATE account_move
+           SET l10n_hn_correlativo = CASE
+               WHEN substring(name from '(\d+)$')::numeric <= 2147483647
+               THEN substring(name from '(\d+)$')::integer
+               ELSE 0 END
+         WHERE name ~ '\d+$'
+    """)
+    cr.execute("""
+        ALTER TABLE l10n_hn_cai
+            DROP COLUMN IF EXISTS last_number,
+            DROP COLUMN IF EXISTS number_next,
+            DROP COLUMN IF EXISTS sequence_last_number,
+            DROP COLUMN IF EXISTS remaining_numbers
+    """)
@@ -1,11 +1,28 @@
 # -*- coding: utf-8 -*-
-from odoo import api, fields, models, _
+from odoo import api, fields, models, tools, _
 from odoo.exceptions import ValidationError, UserError
 from ..utils import compat
 import re
 import os
 import base64
 
+# Mayor número que cabe en los contadores enteros (int4) de l10n_hn.cai
+MAX_FISCAL_NUMBER = 2147483647
+
+CORRELATIVO_RE = re.compile(r'(\d+)$')
+
+
+def _parse_correlativo(name):
+    """Parte numérica final del número de factura (0 si no tiene)."""
+    match = CORRELATIVO_RE.search(name or '')
+    return int(match.group(1)) if match else 0
+
+
+def _extract_correlativo(name):
+    """Correlativo a almacenar: 0 si no tiene parte numérica o no cabe en int4."""
+    number = _parse_correlativo(name)
+    return number if number <= MAX_FISCAL_NUMBER else 0
+
 
 class AccountMove(models.Model):
     _inherit = "account.move"
@@ -23,6 +40,15 @@ class AccountMove(models.Model):
     consecutive_number_oce_hn = fields.Char('Correlativo de la Constancia del Registro de Exonerados')
     l10n_hn_establecimiento_code = fields.Char(string='Código de Establecimiento', store=True, readonly=True)
     l10n_hn_punto_emision_code = fields.Char(string='Punto de Emisión', store=True, readonly=True)
+    l10n_hn_correlativo = fields.Integer(
+        string='Correlativo Fiscal',
+        compute='_compute_l10n_hn_correlativo',
+        store=True,
+        readonly=True,
+        copy=False,
+        help="Parte numérica final del número de factura. Indexado junto con el CAI "
+             "y el diario para las búsquedas de último número y de rango."
+    )
     fiscal_document_type_id = fields.Many2one(
         comodel_name="fiscal_document_type",
         store=True,
@@ -42,6 +68,21 @@ class AccountMove(models.Model):
         for move in self:
             move.has_cai = bool(move.cai)
 
+    @api.depends('name')
+    def _compute_l10n_hn_correlativo(self):
+        """Extrae el correlativo numérico al asignarse el número de factura."""
+        for move in self:
+            move.l10n_hn_correlativo = _extract_correlativo(move.name)
+
+    def init(self):
+        super().init()
+        # Índices parciales sobre facturas publicadas: último número por CAI y
+        # por diario (reconstrucción de los contadores de uso).
+        tools.create_index(self._cr, 'account_move_cai_correlativo_index', self._table,
+                           ['cai', 'l10n_hn_correlativo'], where="state = 'posted'")
+        tools.create_index(self._cr, 'account_move_journal_correlativo_index', self._table,
+                           ['journal_id', 'l10n_hn_correlativo'], where="state = 'posted'")
+
     def _sync_partner_sag_value(self, vals):
         """Propaga el número SAG desde el partner si no fue establecido manualmente."""
         partner_id = vals.get('partner_id')
@@ -112,11 +153,7 @@ class AccountMove(models.Model):
             has_cai_or_sequence = False
             
             # Priority 1: Search for an active and confirmed CAI for this journal
-            cai = self.env['l10n_hn.cai'].search([
-                ('journal_id', '=', self.journal_id.id),
-                ('state', '=', 'confirmed'),
-                ('active', '=', True)
-            ], limit=1)
+            cai = self.env['l10n_hn.cai']._get_confirmed_cai(journal=self.journal_id)
 
             if cai and cai.fiscal_document_type_id:
                 # A CAI was found with document type, use it (highest priority)
@@ -166,100 +203,121 @@ class AccountMove(models.Model):
                 # Don't clear existing value
                 return {'domain': {'fiscal_document_type_id': []}}
 
-    def action_post(self):
+    def _post(self, soft=True):
+        # Los datos fiscales se aplican aquí y no en action_post: también
+        # publican por _post el punto de venta y el cron de publicación
+        # automática.
+        to_post = self
+        if soft:
+            # Mismo criterio que super(): las fechas futuras no se publican.
+            to_post = self.filtered(lambda m: m.date <= fields.Date.context_today(m))
+        # El país se resuelve una vez por compañía, no por factura
+        hn_companies = to_post.company_id.filtered(lambda c: c.country_id.code == 'HN')
+        hn_moves = to_post.filtered(lambda m: m.company_id in hn_companies)
+        hn_moves._apply_fiscal_data()
+        posted = super(AccountMove, self)._post(soft=soft)
+        if posted & hn_moves:
+            # Los contadores de uso del CAI se calculan desde las facturas
+            # publicadas: solo se descartan los valores ya leídos.
+            cai_model = self.env['l10n_hn.cai']
+            cai_model.invalidate_model(cai_model._counter_fields)
+        return posted
 
-        for move in self.filtered(
-                lambda m: m.company_id.country_id.code == 'HN'):
+    def _apply_fiscal_data(self):
+        """
+        Valida y copia los datos fiscales (CAI o secuencia) a las facturas
+        cuyo diario usa una secuencia fiscal, antes de publicarlas.
+        """
+        # Agrupar por diario: el CAI y la secuencia se resuelven una sola vez
+        # por diario y los datos fiscales se escriben con un write por grupo.
+        moves_by_journal = {}
+        for move in self:
             sequence = move.journal_id.sequence_id
-            
-            if not (sequence and sequence.active_sar):
-                continue
+            if sequence and sequence.active_sar:
+                moves_by_journal.setdefault(move.journal_id, []).append(move.id)
 
-            # Priority 1: Check if there's a confirmed CAI for this journal
-            # This takes precedence over the sequence's fiscal_document_type_id
-            cai = self.env['l10n_hn.cai'].search([
-                ('journal_id', '=', move.journal_id.id),
-                ('state', '=', 'confirmed'),
-                ('active', '=', True)
-            ], limit=1)
-
-            # 1. Validation: Check if the invoice date is within the CAI's validity period.
-            # Use CAI's emition_limit if available, otherwise use sequence's
-            emition_limit = cai.emition_limit if cai else sequence.emition_limit
+        # Priority 1: Check if there's a confirmed CAI for this journal
+        # This takes precedence over the sequence's fiscal_document_type_id
+        for journal, move_ids in moves_by_journal.items():
+            moves = self.browse(move_ids)
+            sequence = journal.sequence_id
+            cai = self.env['l10n_hn.cai']._get_confirmed_cai(journal=journal)
+            moves._check_fiscal_range(cai, sequence)
+            vals = self._get_fiscal_vals(cai, sequence)
+            if vals:
+                moves.write(vals)
+
+    def _check_fiscal_range(self, cai, sequence):
+        """
+        Valida las facturas de un mismo diario contra la fecha límite de
+        emisión y el rango autorizado del CAI (o de la secuencia si no hay CAI).
+        """
+        # 1. Validation: Check if the invoice date is within the CAI's validity period.
+        # Use CAI's emition_limit if available, otherwise use sequence's
+        emition_limit = cai.emition_limit if cai else sequence.emition_limit
+        # 2. Validation: Check if the invoice number is within the authorized range.
+        # Use CAI's range if available, otherwise use sequence's
+        range_start = cai.range_start if cai else sequence.range_start
+        range_end = cai.range_end if cai else sequence.range_end
+
+        for move in self:
             if move.invoice_date and emition_limit and move.invoice_date > emition_limit:
                 raise ValidationError(_(
                     'La fecha de la factura (%s) es posterior a la fecha límite para emisión del CAI (%s).') % (
                                           move.invoice_date, emition_limit))
 
-            # 2. Validation: Check if the invoice number is within the authorized range.
-            # Use CAI's range if available, otherwise use sequence's
-            range_start = cai.range_start if cai else sequence.range_start
-            range_end = cai.range_end if cai else sequence.range_end
             if move.name and move.name != '/':
-                try:
-                    match = re.search(r'(\d+)$', move.name)
-                    if not match:
-                        raise UserError(_('No se pudo extraer la parte numérica del número de factura "%s" para la validación del CAI.') % move.name)
-                    
-                    invoice_number = int(match.group(1))
-
-                    if range_start and range_end and not (range_start <= invoice_number <= range_end):
-                        raise ValidationError(_(
-                            'El número de factura (%s) está fuera del rango fiscal autorizado por el CAI (%s - %s).') % (
-                                                  invoice_number, range_start, range_end))
-                except (ValueError, TypeError):
-                    raise UserError(_(
-                        'No se pudo extraer el número de la factura "%s". El formato no es un número válido para la validación del CAI.') % move.name)
-
-            # 3. Data Population: Copy fiscal data from CAI (priority) or sequence to the move.
-            # Only override fiscal_document_type_id if there's a valid value from CAI or sequence
-            if cai and cai.fiscal_document_type_id:
-                # Priority 1: Use CAI's fiscal_document_type_id if available
-                # When CAI is confirmed, it updates the sequence, so we can use sequence values
-                # for range_start_str and range_end_str
-                move.fiscal_document_type_id = cai.fiscal_document_type_id.id
-                move.cai = cai.name
-                move.emition = cai.emition
-                move.emition_limit = cai.emition_limit
-                move.declaration = cai.declaration
-                move.range_end_str = sequence.range_end_str
-                move.range_start_str = sequence.range_start_str
-                move.l10n_hn_establecimiento_code = cai.establecimiento_id.code if cai.establecimiento_id else False
-                move.l10n_hn_punto_emision_code = cai.punto_emision_id.code if cai.punto_emision_id else False
-            elif sequence.fiscal_document_type_id:
-                # Priority 2: Use sequence's fiscal_document_type_id if available and no CAI
-                move.fiscal_document_type_id = sequence.fiscal_document_type_id.id
-                move.cai = sequence.cai
-                move.emition = sequence.emition
-                move.emition_limit = sequence.emition_limit
-                move.declaration = sequence.declaration
-                move.range_end_str = sequence.range_end_str
-                move.range_start_str = sequence.range_start_str
-                move.l10n_hn_establecimiento_code = sequence.l10n_hn_establecimiento_code
-                move.l10n_hn_punto_emision_code = sequence.l10n_hn_punto_emision_code
-            else:
-                # Priority 3: No CAI and sequence has no fiscal_document_type_id
-                # Keep the user-selected fiscal_document_type_id (don't override)
-                # Only copy other fiscal data if available in sequence
-                if sequence.cai:
-                    move.cai = sequence.cai
-                if sequence.emition:
-                    move.emition = sequence.emition
-                if sequence.emition_limit:
-                    move.emition_limit = sequence.emition_limit
-                if sequence.declaration:
-                    move.declaration = sequence.declaration
-                if sequence.range_end_str:
-                    move.range_end_str = sequence.range_end_str
-                if sequence.range_start_str:
-                    move.range_start_str = sequence.range_start_str
-                if sequence.l10n_hn_establecimiento_code:
-                    move.l10n_hn_establecimiento_code = sequence.l10n_hn_establecimiento_code
-                if sequence.l10n_hn_punto_emision_code:
-                    move.l10n_hn_punto_emision_code = sequence.l10n_hn_punto_emision_code
-                # fiscal_document_type_id is NOT overridden - keep user's selection
-
-        return super(AccountMove, self).action_post()
+                # Un correlativo fuera de int4 no se almacena: se valida el número real.
+                invoice_number = move.l10n_hn_correlativo or _parse_correlativo(move.name)
+                if not invoice_number:
+                    raise UserError(_('No se pudo extraer la parte numérica del número de factura "%s" para la validación del CAI.') % move.name)
+
+                if range_start and range_end and not (range_start <= invoice_number <= range_end):
+                    raise ValidationError(_(
+                        'El número de factura (%s) está fuera del rango fiscal autorizado por el CAI (%s - %s).') % (
+                                              invoice_number, range_start, range_end))
+
+    @api.model
+    def _get_fiscal_vals(self, cai, sequence):
+        """
+        Datos fiscales a copiar en las facturas del diario: del CAI (prioridad)
+        o de la secuencia.
+        """
+        # 3. Data Population: Copy fiscal data from CAI (priority) or sequence to the move.
+        # Only override fiscal_document_type_id if there's a valid value from CAI or sequence
+        if cai and cai.fiscal_document_type_id:
+            # Priority 1: Use CAI's fiscal_document_type_id if available
+            # When CAI is confirmed, it updates the sequence, so we can use sequence values
+            # for range_start_str and range_end_str
+            return {
+                'fiscal_document_type_id': cai.fiscal_document_type_id.id,
+                'cai': cai.name,
+                'emition': cai.emition,
+                'emition_limit': cai.emition_limit,
+                'declaration': cai.declaration,
+                'range_end_str': sequence.range_end_str,
+                'range_start_str': sequence.range_start_str,
+                'l10n_hn_establecimiento_code': cai.establecimiento_id.code if cai.establecimiento_id else False,
+                'l10n_hn_punto_emision_code': cai.punto_emision_id.code if cai.punto_emision_id else False,
+            }
+        sequence_vals = {
+            'cai': sequence.cai,
+            'emition': sequence.emition,
+            'emition_limit': sequence.emition_limit,
+            'declaration': sequence.declaration,
+            'range_end_str': sequence.range_end_str,
+            'range_start_str': sequence.range_start_str,
+            'l10n_hn_establecimiento_code': sequence.l10n_hn_establecimiento_code,
+            'l10n_hn_punto_emision_code': sequence.l10n_hn_punto_emision_code,
+        }
+        if sequence.fiscal_document_type_id:
+            # Priority 2: Use sequence's fiscal_document_type_id if available and no CAI
+            sequence_vals['fiscal_document_type_id'] = sequence.fiscal_document_type_id.id
+            return sequence_vals
+        # Priority 3: No CAI and sequence has no fiscal_document_type_id
+        # Keep the user-selected fiscal_document_type_id (don't override)
+        # Only copy other fiscal data if available in sequence
+        return {key: value for key, value in sequence_vals.items() if value}
 
     @api.depends('amount_total', 'currency_id')
     def get_amount_in_words(self):
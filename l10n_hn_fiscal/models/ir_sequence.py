@@ -38,10 +38,7 @@ class IrSequence(models.Model):
         """
         for seq in self:
             if seq.id:
-                cai_confirmado = self.env['l10n_hn.cai'].search([
-                    ('sequence_id', '=', seq.id),
-                    ('state', '=', 'confirmed')
-                ], limit=1)
+                cai_confirmado = self.env['l10n_hn.cai']._get_confirmed_cai(sequence=seq)
                 seq.has_confirmed_cai = bool(cai_confirmado)
             else:
                 # Si no tiene id, es un registro nuevo, no puede tener CAI confirmado
@@ -61,10 +58,7 @@ class IrSequence(models.Model):
             if seq.active_sar:
                 # La secuencia está (o estuvo) asociada a un CAI.
                 # Verifiquemos si el CAI asociado *sigue* en estado 'confirmado'.
-                cai_confirmado = self.env['l10n_hn.cai'].search([
-                    ('sequence_id', '=', seq.id),
-                    ('state', '=', 'confirmed')
-                ], limit=1)
+                cai_confirmado = self.env['l10n_hn.cai']._get_confirmed_cai(sequence=seq)
 
                 if cai_confirmado:
                     # SÍ, existe un CAI confirmado apuntando a esta secuencia.
@@ -1,8 +1,7 @@
 # -*- coding: utf-8 -*-
 import uuid
 import logging
-import re
-from odoo import api, fields, models, _
+from odoo import api, fields, models, tools, _
 from odoo.exceptions import UserError, ValidationError
 from ..utils import compat
 
@@ -77,9 +76,19 @@ class L10nHnCai(models.Model):
     journal_type = fields.Char(string='Tipo de Diario', compute='_compute_journal_type', store=False, readonly=True)
     journal_code = fields.Char(related='journal_id.code', string='Código del Diario', readonly=True)
 
+    # Contadores de uso: se calculan al leerlos con MAX(l10n_hn_correlativo)
+    # sobre los índices parciales de account.move (ver _compute_usage_counters).
+    last_number = fields.Integer(
+        string='Último Número Usado',
+        compute='_compute_usage_counters',
+        readonly=True,
+        store=False,
+        help="Último número de factura publicado con este CAI."
+    )
+
     number_next = fields.Integer(
         string='Próximo Número a Emitir',
-        compute='_compute_number_next',
+        compute='_compute_usage_counters',
         readonly=True,
         store=False,
         help="Próximo número de factura que se emitirá basado en el último número usado con este CAI."
@@ -87,7 +96,7 @@ class L10nHnCai(models.Model):
 
     sequence_last_number = fields.Integer(
         string='Último Número Real Usado',
-        compute='_compute_sequence_last_number',
+        compute='_compute_usage_counters',
         readonly=True,
         store=False,
         help="Último número de factura real encontrado en el sistema para el diario asociado."
@@ -95,7 +104,7 @@ class L10nHnCai(models.Model):
 
     remaining_numbers = fields.Integer(
         string='Números Restantes',
-        compute='_compute_remaining_numbers',
+        compute='_compute_usage_counters',
         readonly=True,
         store=False,
         help="Cantidad de números fiscales disponibles en el rango de CAI actual."
@@ -239,6 +248,9 @@ class L10nHnCai(models.Model):
         }
         self.sequence_id.with_context(allow_cai_write=True).write(sequence_vals)
 
+        # El próximo número se siembra desde las facturas publicadas
+        self.invalidate_recordset(self._counter_fields)
+
         # --- MODIFICACIÓN AQUÍ ---
         # Handle date range
         # Solo buscamos si el rango de fechas ya existe.
@@ -297,7 +309,15 @@ class L10nHnCai(models.Model):
             if rec.confirmation_hash:
                 raise UserError(
                     _('No se puede eliminar un CAI que ya ha sido confirmado, incluso si está en estado de borrador.'))
-        return super(L10nHnCai, self).unlink()
+        res = super(L10nHnCai, self).unlink()
+        self.clear_caches()
+        return res
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super(L10nHnCai, self).create(vals_list)
+        self.clear_caches()
+        return records
 
     def write(self, vals):
         for rec in self:
@@ -309,109 +329,83 @@ class L10nHnCai(models.Model):
                 if any(key not in allowed_changes for key in vals):
                     raise UserError(
                         _('No se pueden modificar los campos de un CAI confirmado. Primero debe restablecerlo a borrador.'))
-        return super(L10nHnCai, self).write(vals)
-
-    def _get_last_number_for_journal(self, journal):
-        """
-        Obtiene el último número de factura usado para un diario específico.
-        Busca en las facturas publicadas del diario y extrae el número más alto.
-        """
-        if not journal or not journal.sequence_id:
-            return 0
-
-        # Buscar facturas publicadas del diario
-        moves = self.env['account.move'].search([
-            ('journal_id', '=', journal.id),
-            ('state', '=', 'posted'),
-            ('name', '!=', '/'),
-        ])
-
-        max_number = 0
-        for move in moves:
-            if move.name:
-                # Extraer el número de la factura (última parte numérica)
-                match = re.search(r'(\d+)$', move.name)
-                if match:
-                    try:
-                        num = int(match.group(1))
-                        if num > max_number:
-                            max_number = num
-                    except (ValueError, TypeError):
-                        continue
-
-        return max_number
-
-    def _get_last_number_for_cai(self):
-        """
-        Obtiene el último número de factura usado para este CAI específico.
-        Busca en las facturas publicadas que tengan el mismo CAI y extrae el número más alto.
-        """
-        if not self.name:
-            return 0
-
-        # Buscar facturas publicadas con el mismo CAI
-        moves = self.env['account.move'].search([
-            ('cai', '=', self.name),
-            ('state', '=', 'posted'),
-            ('name', '!=', '/'),
-        ])
-
-        max_number = 0
-        for move in moves:
-            if move.name:
-                # Extraer el número de la factura (última parte numérica)
-                match = re.search(r'(\d+)$', move.name)
-                if match:
-                    try:
-                        num = int(match.group(1))
-                        if num > max_number:
-                            max_number = num
-                    except (ValueError, TypeError):
-                        continue
-
-        return max_number
-
-    @api.depends('name')
-    def _compute_number_next(self):
+        res = super(L10nHnCai, self).write(vals)
+        # confirm_cai, _reset_to_draft_with_hash y el archivado pasan por aquí
+        if self._resolver_fields.intersection(vals):
+            self.clear_caches()
+        return res
+
+    # ------------------------------------------------------------
+    # RESOLUCIÓN DIARIO / SECUENCIA → CAI CONFIRMADO (EN CACHÉ)
+    # ------------------------------------------------------------
+    _resolver_fields = {'state', 'active', 'journal_id', 'sequence_id'}
+
+    @api.model
+    def _get_confirmed_cai(self, journal=None, sequence=None):
         """
-        Calcula el próximo número a emitir basado en el último número usado con este CAI.
-        Busca facturas con el mismo CAI, encuentra el número más alto y le suma 1.
-        Si no hay facturas con este CAI, retorna 0 (al confirmar se usará range_start).
-        Nota: Este campo se recalcula automáticamente cada vez que se accede (store=False).
+        CAI confirmado del diario (activo) o de la secuencia, resuelto desde la
+        caché del registro con los mismos dominios que las búsquedas que
+        reemplaza; la caché se invalida al crear, confirmar, restablecer,
+        archivar, reasignar o eliminar un CAI.
         """
-        for rec in self:
-            if rec.name:
-                last_num = rec._get_last_number_for_cai()
-                # Si hay un último número, el próximo es ese + 1, si no, es 0
-                rec.number_next = (last_num + 1) if last_num > 0 else 0
-            else:
-                rec.number_next = 0
-
-    @api.depends('name', 'journal_id')
-    def _compute_sequence_last_number(self):
-        """
-        Calcula el último número real usado en facturas del diario asociado.
-        """
-        for rec in self:
-            if rec.journal_id:
-                try:
-                    last_num = rec._get_last_number_for_journal(rec.journal_id)
-                    rec.sequence_last_number = last_num or 0
-                except Exception as e:
-                    _logger.exception("Error computing sequence_last_number for CAI %s: %s", rec.id, e)
-                    rec.sequence_last_number = 0
-            else:
-                rec.sequence_last_number = 0
-
-    @api.depends('number_next', 'range_end')
-    def _compute_remaining_numbers(self):
+        active_test = self.env.context.get('active_test', True)
+        if journal and journal._origin.id:
+            cai_id = self._get_confirmed_cai_id('journal_id', journal._origin.id, active_test)
+        elif sequence and sequence._origin.id:
+            cai_id = self._get_confirmed_cai_id('sequence_id', sequence._origin.id, active_test)
+        else:
+            cai_id = False
+        return self.browse(cai_id)
+
+    @api.model
+    @tools.ormcache('field_name', 'record_id', 'active_test')
+    def _get_confirmed_cai_id(self, field_name, record_id, active_test):
+        domain = [(field_name, '=', record_id), ('state', '=', 'confirmed')]
+        if field_name == 'journal_id':
+            # El diario exige un CAI activo; la secuencia acepta cualquier CAI
+            # confirmado (bloqueo de escritura / has_confirmed_cai).
+            domain.append(('active', '=', True))
+        return self.sudo().with_context(active_test=active_test).search(domain, limit=1).id
+
+    # ------------------------------------------------------------
+    # CONTADORES DE USO
+    # ------------------------------------------------------------
+    _counter_fields = ['last_number', 'number_next', 'sequence_last_number', 'remaining_numbers']
+
+    @api.depends('name', 'journal_id', 'range_end')
+    def _compute_usage_counters(self):
         """
-        Calcula los números restantes disponibles en el rango del CAI.
+        Calcula los contadores de uso con una sola consulta para todos los
+        CAI: el número más alto publicado con el CAI y en su diario
+        (MAX(l10n_hn_correlativo) sobre los índices parciales de facturas
+        publicadas, sin recorrer las facturas). Publicar no escribe en el
+        CAI, por lo que no se bloquea su fila en cada factura.
         """
+        cai_ids = tuple(rec._origin.id for rec in self if rec._origin.id)
+        numbers = {}
+        if cai_ids:
+            self.env['account.move'].flush_model(['cai', 'journal_id', 'state', 'l10n_hn_correlativo'])
+            self.env.cr.execute("""
+                SELECT c.id,
+                       (SELECT MAX(m.l10n_hn_correlativo)
+                          FROM account_move m
+                         WHERE m.state = 'posted' AND m.cai = c.name),
+                       (SELECT MAX(m.l10n_hn_correlativo)
+                          FROM account_move m
+                         WHERE m.state = 'posted' AND m.journal_id = c.journal_id)
+                  FROM l10n_hn_cai c
+                 WHERE c.id IN %s
+            """, [cai_ids])
+            numbers = {cai_id: (last or 0, journal_last or 0)
+                       for cai_id, last, journal_last in self.env.cr.fetchall()}
         for rec in self:
+            last_number, journal_last_number = numbers.get(rec._origin.id, (0, 0))
+            rec.last_number = last_number
+            # Si hay un último número, el próximo es ese + 1, si no, es 0
+            rec.number_next = (last_number + 1) if last_number > 0 else 0
+            rec.sequence_last_number = journal_last_number
             if rec.range_end and rec.number_next:
-                remaining = rec.range_end - rec.number_next + 1
-                rec.remaining_numbers = max(0, remaining)  # No permitir valores negativos
+                # No permitir valores negativos
+                rec.remaining_numbers = max(0, rec.range_end - rec.number_next + 1)
             else:
                 rec.remaining_numbers = 0
-
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+from dateutil.relativedelta import relativedelta
+
+from odoo import fields
+from odoo.addons.account.tests.common import AccountTestInvoicingCommon
+from odoo.exceptions import ValidationError
+from odoo.tests import tagged
+
+
+@tagged('post_install', '-at_install')
+class TestL10nHnCai(AccountTestInvoicingCommon):
+
+    @classmethod
+    def setUpClass(cls, chart_template_ref=None):
+        super().setUpClass(chart_template_ref=chart_template_ref)
+        cls.env.user.sudo().groups_id = [(4, cls.env.ref('l10n_hn_fiscal.group_confirm_cai').id)]
+        company = cls.company_data['company']
+        honduras = cls.env.ref('base.hn')
+        company.sudo().country_id = honduras
+
+        cls.journal = cls.company_data['default_journal_sale']
+        cls.sequence = cls.journal.sequence_id
+        cls.sequence.sudo().implementation = 'no_gap'
+
+        document_type = cls.env['fiscal_document_type'].create({
+            'name': 'Factura de prueba',
+            'code': 'T01',
+            'internal_type': 'invoice',
+            'country_id': honduras.id,
+        })
+        address = cls.env['res.partner'].create({
+            'name': 'Tienda Central',
+            'type': 'other',
+            'parent_id': company.partner_id.id,
+        })
+        establecimiento = cls.env['l10n_hn.establecimiento'].create({
+            'name': 'Tienda Central',
+            'code': '001',
+            'address_id': address.id,
+            'company_id': company.id,
+        })
+        punto_emision = cls.env['l10n_hn.punto.emision'].create({
+            'name': 'Caja 1',
+            'code': '001',
+            'establecimiento_id': establecimiento.id,
+        })
+        today = fields.Date.today()
+        cls.cai = cls.env['l10n_hn.cai'].create({
+            'name': 'TEST-CAI-0001',
+            'company_id': company.id,
+            'journal_id': cls.journal.id,
+            'sequence_id': cls.sequence.id,
+            'fiscal_document_type_id': document_type.id,
+            'emition': today - relativedelta(months=1),
+            'emition_limit': today + relativedelta(years=1),
+            'range_start': 1,
+            'range_end': 100,
+            'establecimiento_id': establecimiento.id,
+            'punto_emision_id': punto_emision.id,
+            'digitos_correlativo': 8,
+        })
+        cls.cai.confirm_cai()
+
+    def _create_invoices(self, count=1):
+        return self.env['account.move'].create([{
+            'move_type': 'out_invoice',
+            'journal_id': self.journal.id,
+            'partner_id': self.partner_a.id,
+            'invoice_date': fields.Date.today(),
+            'invoice_line_ids': [(0, 0, {
+                'name': 'Servicio',
+                'quantity': 1,
+                'price_unit': 100.0,
+                'tax_ids': [(6, 0, [])],
+            })],
+        } for _i in range(count)])
+
+    def _get_date_range(self):
+        return self.env['ir.sequence.date_range'].search([
+            ('sequence_id', '=', self.sequence.id),
+            ('date_from', '=', self.cai.emition),
+            ('date_to', '=', self.cai.emition_limit),
+        ])
+
+    def test_post_assigns_fiscal_numbers_and_counters(self):
+        moves = self._create_invoices(3)
+        moves.action_post()
+
+        self.assertEqual(sorted(moves.mapped('l10n_hn_correlativo')), [1, 2, 3])
+        self.assertEqual(set(moves.mapped('cai')), {self.cai.name})
+        self.assertTrue(all(name.startswith('001-001-T01-') for name in moves.mapped('name')))
+        self.assertRecordValues(self.cai, [{
+            'last_number': 3,
+            'number_next': 4,
+            'remaining_numbers': 97,
+            'sequence_last_number': 3,
+        }])
+
+    def test_post_without_action_post_updates_counters(self):
+        # Punto de venta / cron de publicación automática: solo llaman a _post.
+        move = self._create_invoices()
+        move._post(soft=False)
+
+        self.assertEqual(move.cai, self.cai.name)
+        self.assertEqual(move.l10n_hn_correlativo, 1)
+        self.assertEqual(self.cai.last_number, 1)
+        self.assertEqual(self.cai.number_next, 2)
+
+    def test_confirm_reseeds_from_posted_moves(self):
+        self._create_invoices(2).action_post()
+        # Secuencia desactualizada: confirmar no debe volver a emitir 1 y 2.
+        self._get_date_range().number_next_actual = 1
+
+        self.cai._reset_to_draft_with_hash(self.cai.confirmation_hash)
+        self.cai.confirm_cai()
+
+        self.assertEqual(self.cai.number_next, 3)
+        self.assertEqual(self._get_date_range().number_next_actual, 3)
+        move = self._create_invoices()
+        move.action_post()
+        self.assertEqual(move.l10n_hn_correlativo, 3)
+        self.assertEqual(self.cai.remaining_numbers, 97)
+
+    def test_correlativo_above_int4_is_range_checked(self):
+        move = self.env['account.move'].new({
+            'name': '001-001-T01-99999999999',
+            'invoice_date': fields.Date.today(),
+        })
+        self.assertEqual(move.l10n_hn_correlativo, 0)
+        with self.assertRaisesRegex(ValidationError, 'fuera del rango'):
+            move._check_fiscal_range(self.cai, self.sequence)